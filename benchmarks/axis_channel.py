@@ -0,0 +1,99 @@
+"""
+Loopback check of the UDP axis channel under packet loss and reordering
+
+`AxisSend` sends to a relay socket which drops a fraction of the datagrams and holds some back so
+they arrive late, then forwards the rest to `AxisReceive`. The receiver must never accept an axis
+state older than one it has already accepted.
+
+Then checks a laptop restart (a new session whose sequence starts again, with late datagrams from
+the old session arriving after it) and that short or corrupt datagrams are dropped without raising.
+
+Run from the repository root with:
+	python -m benchmarks.axis_channel
+"""
+
+# Import libraries
+import time
+import random
+import socket
+import threading
+
+# Import classes
+from classes.Sockets import AxisSend, AxisReceive
+
+RELAY_PORT, RECEIVE_PORT = 5903, 5904
+COUNT = 5000
+LOSS = 0.1 # Fraction of datagrams dropped
+REORDER = 0.2 # Fraction of datagrams held back and sent after later ones
+
+
+def relay(sock, count):
+	"""Forward datagrams to the receiver with loss and reordering"""
+	held = []
+	for _ in range(count):
+		datagram = sock.recv(1024)
+
+		if random.random() < LOSS:
+			continue
+		if random.random() < REORDER:
+			held.append(datagram)
+			continue
+
+		sock.sendto(datagram, ("localhost", RECEIVE_PORT))
+
+		# Release held datagrams after a newer one has gone through
+		if held and random.random() < 0.5:
+			sock.sendto(held.pop(0), ("localhost", RECEIVE_PORT))
+
+	for datagram in held:
+		sock.sendto(datagram, ("localhost", RECEIVE_PORT))
+
+
+def receive(receiver, accepted):
+	"""Collect accepted FORWARD values until the channel goes quiet"""
+	while True:
+		axes = receiver.recv(timeout=0.5)
+		if axes is None:
+			break
+		accepted.append(axes["FORWARD"])
+
+
+if __name__ == "__main__":
+	relay_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	relay_sock.bind(("localhost", RELAY_PORT))
+	receiver = AxisReceive(RECEIVE_PORT)
+	sender = AxisSend("localhost", RELAY_PORT)
+
+	accepted = []
+	threading.Thread(target=relay, args=(relay_sock, COUNT), daemon=True).start()
+	receive_thread = threading.Thread(target=receive, args=(receiver, accepted))
+	receive_thread.start()
+
+	# The FORWARD value counts up, so the rover should only ever see it increase
+	for i in range(COUNT):
+		sender.send({"FORWARD": i / COUNT, "TURN": 0.0, "L_TRIG": 0.0, "R_TRIG": 0.0})
+		time.sleep(0.0001)
+
+	receive_thread.join()
+	assert accepted == sorted(accepted), "Receiver accepted an out of date axis state"
+
+	print(f"Sent: {COUNT}")
+	print(f"Accepted: {receiver.received}")
+	print(f"Dropped as out of date: {receiver.dropped}")
+	print(f"Lost: {COUNT - receiver.received - receiver.dropped - receiver.malformed}")
+	print("Accepted axis states were always in order")
+
+	# Laptop restart: the new session is accepted, and late datagrams from the old one are not
+	old = [sender.header.pack(sender.session, sender.sequence + i) + sender.codec.encode({"FORWARD": -1.0}) for i in (1, 2)]
+	restarted = AxisSend("localhost", RELAY_PORT)
+	new = [restarted.header.pack(restarted.session, i) + restarted.codec.encode({"FORWARD": i / 10}) for i in (1, 2, 3)]
+
+	results = [receiver.process_datagram(datagram) for datagram in [new[0], old[0], new[1], old[1], new[2]]]
+	assert [None if axes is None else round(axes["FORWARD"], 3) for axes in results] == [0.1, None, 0.2, None, 0.3], results
+	print("After a restart, late datagrams from the old session were dropped")
+
+	malformed = receiver.malformed
+	fresh = restarted.header.pack(restarted.session, 10) + restarted.codec.encode({"FORWARD": 1.0})
+	for datagram in [b"", b"\x01\x02", fresh[:restarted.header.size + 2], fresh[:-3]]:
+		assert receiver.process_datagram(datagram) is None
+	print(f"Malformed datagrams dropped: {receiver.malformed - malformed}")
@@ -0,0 +1,110 @@
+"""
+Camera frame rate against simulated round trip time for each camera transport
+
+A local sender produces 640x480 JPEG frames at SOURCE_FPS and sends them to a `CameraReceive` on a
+`NetworkLoop`. The link delay is simulated on the sender side:
+- REQ_REP waits half the RTT before each frame (request) and again after the "OK" (reply), since
+  the next frame can't be sent until the reply arrives
+- PUB_SUB and PUSH_PULL pass frames through a delay line which holds each one for half the RTT
+  without stopping the next frame from being captured
+
+Run from the repository root with:
+	python -m benchmarks.camera_transport
+"""
+
+# Import libraries
+import cv2
+import time
+import queue
+import threading
+import numpy as np
+
+# Import classes
+from classes.Slots import FrameSlot
+from classes.NetworkLoop import NetworkLoop
+from classes.Sockets import CameraReceive, CameraSend, REQ_REP, PUB_SUB, PUSH_PULL
+
+RTTS = [0, 10, 25, 50, 100] # ms
+SOURCE_FPS = 60
+DURATION = 2.0 # seconds per measurement
+PORT = 5951
+
+
+def make_frame(i):
+	"""Moving gradient test frame"""
+	x = np.arange(640, dtype=np.uint16)
+	row = ((x + 4 * i) % 256).astype(np.uint8)
+	frame = np.repeat(np.tile(row, (480, 1))[:, :, None], 3, axis=2)
+	return cv2.imencode(".jpg", frame)[1]
+
+
+def send_frames(mode, rtt, stop):
+	"""Send frames at SOURCE_FPS through the simulated link until `stop` is set"""
+	address = f"tcp://*:{PORT}" if mode == PUB_SUB else f"tcp://localhost:{PORT}"
+	sender = CameraSend(address, mode)
+	frames = [make_frame(i) for i in range(30)]
+
+	# Delay line for the pipelined modes
+	line = queue.Queue()
+	def deliver():
+		while True:
+			release, frame = line.get()
+			if frame is None:
+				return
+			time.sleep(max(0, release - time.perf_counter()))
+			sender.send_jpg("cam", frame)
+
+	if mode != REQ_REP:
+		threading.Thread(target=deliver, daemon=True).start()
+
+	i = 0
+	next_frame = time.perf_counter()
+	while not stop.is_set():
+		frame = frames[i % len(frames)]
+		if mode == REQ_REP:
+			time.sleep(rtt / 2)
+			sender.send_jpg("cam", frame)
+			time.sleep(rtt / 2)
+		else:
+			line.put((time.perf_counter() + rtt / 2, frame))
+		i += 1
+
+		next_frame = max(next_frame + 1 / SOURCE_FPS, time.perf_counter())
+		time.sleep(max(0, next_frame - time.perf_counter()))
+
+	line.put((0, None))
+	time.sleep(0.2)
+	sender.close()
+
+
+def measure(mode, rtt):
+	"""Returns the frames per second received in `mode` with a simulated RTT (seconds)"""
+	slot = FrameSlot()
+	network = NetworkLoop()
+	address = f"tcp://localhost:{PORT}" if mode == PUB_SUB else f"tcp://*:{PORT}"
+	network.add(CameraReceive({"cam": slot}, address, mode=mode))
+	network.start()
+
+	stop = threading.Event()
+	sender = threading.Thread(target=send_frames, args=(mode, rtt, stop))
+	sender.start()
+
+	# Let the connection settle before counting
+	time.sleep(0.5)
+	start = slot.sequence
+	time.sleep(DURATION)
+	fps = (slot.sequence - start) / DURATION
+
+	stop.set()
+	sender.join()
+	network.stop()
+	return fps
+
+
+if __name__ == "__main__":
+	modes = [REQ_REP, PUB_SUB, PUSH_PULL]
+	print(f"Source: {SOURCE_FPS} fps, 640x480 JPEG")
+	print(f"{'RTT (ms)':>9}" + "".join(f"{mode:>10}" for mode in modes))
+	for rtt in RTTS:
+		results = [measure(mode, rtt / 1000) for mode in modes]
+		print(f"{rtt:>9}" + "".join(f"{fps:>10.1f}" for fps in results))
@@ -0,0 +1,37 @@
+"""
+Micro-benchmark of control message encoding
+
+Compares the original path (`strftime` time string + `json.dumps` + `"<Hd"` header) with the
+negotiated binary codec for the messages `ActionHandler` sends most often.
+
+Run from the repository root with:
+	python -m benchmarks.control_codec
+"""
+
+# Import libraries
+import timeit
+
+# Import classes
+from classes.ControlCodec import JsonCodec, BinaryCodec
+
+MESSAGES = {
+	"drive": {"FORWARD": 0.7312, "TURN": -0.1204},
+	"all axes": {"FORWARD": 0.7312, "TURN": -0.1204, "L_TRIG": 0.5, "R_TRIG": 0.0},
+	"command": {"QUIT_ROVER": True},
+}
+REPEATS = 100000
+
+
+if __name__ == "__main__":
+	json_codec = JsonCodec()
+	binary_codec = BinaryCodec()
+
+	print(f"{'message':>10} {'json (us)':>10} {'bin (us)':>10} {'json (B)':>9} {'bin (B)':>8}")
+	for name, message in MESSAGES.items():
+		json_time = timeit.timeit(lambda: json_codec.encode(message), number=REPEATS) / REPEATS * 1e6
+		binary_time = timeit.timeit(lambda: binary_codec.encode(message), number=REPEATS) / REPEATS * 1e6
+
+		json_size = len(json_codec.encode(message))
+		binary_size = len(binary_codec.encode(message))
+
+		print(f"{name:>10} {json_time:>10.2f} {binary_time:>10.2f} {json_size:>9} {binary_size:>8}")
@@ -0,0 +1,212 @@
+"""
+Glass-to-glass benchmark: laptop_main running headless against the synthetic rover
+
+Runs the synthetic rover's channels and `laptop_main.main_function` in this process, with SDL's dummy
+video driver and a virtual gamepad moving the sticks so axes are sent. Over the last WINDOW seconds of
+the run it measures:
+- per camera: capture to display latency (the rover's capture time, carried with each frame, to just
+  after the display update that showed it), displayed fps, frames dropped by the UI (overwritten
+  before being drawn) and lost before reaching the laptop (gaps in the frame ids)
+- control latency from `send_axes` to the rover receiving the datagram, and the control jitter
+- CPU time of each thread (from /proc), as a percentage of one core
+- the text cache's hit rate over the whole run
+
+Results are printed as JSON (and written to --output), along with the commit, so runs can be compared.
+The rover's frames are pre-encoded, but it still shares the machine, so its threads are listed too.
+
+Run from the repository root with:
+	python -m benchmarks.glass_to_glass [--cameras N] [--width W] [--height H] [--fps F] [--duration S] [--output FILE]
+"""
+
+# Import libraries
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+import subprocess
+import numpy as np
+
+# No window or audio device (must be set before pygame is imported)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import laptop_main
+import synthetic_rover
+
+# Import classes
+from classes.Sockets import ControlReceive, AxisReceive
+
+WINDOW = 10.0 # Seconds at the end of the run that are measured
+
+
+class VirtualJoystick:
+	"""Stands in for a pygame joystick: the sticks move smoothly and no buttons are pressed"""
+	def __init__(self):
+		self.start = time.monotonic()
+
+	def get_axis(self, axis):
+		return math.sin(time.monotonic() - self.start + axis)
+
+	def get_button(self, button):
+		return False
+
+
+class VirtualGamepad:
+	def __init__(self):
+		self.joystick = VirtualJoystick()
+		self.name = "Virtual gamepad"
+
+
+def thread_cpu():
+	"""Returns the CPU time (s) used so far by each thread of this process, keyed by thread name"""
+	names = dict((thread.native_id, thread.name) for thread in threading.enumerate())
+	ticks = os.sysconf("SC_CLK_TCK")
+
+	usage = {}
+	for tid in os.listdir("/proc/self/task"):
+		try:
+			with open(f"/proc/self/task/{tid}/stat") as f:
+				stat = f.read()
+		except FileNotFoundError:
+			continue
+
+		# Threads not started by Python (eg ZMQ's) are named by their command
+		comm = stat[stat.index("(") + 1:stat.rindex(")")]
+		name = names.get(int(tid), comm)
+
+		fields = stat[stat.rindex(")") + 2:].split()
+		usage[name] = usage.get(name, 0) + (int(fields[11]) + int(fields[12])) / ticks
+	return usage
+
+
+def percentiles(values):
+	if not len(values):
+		return None
+	return dict(zip(["p50", "p95", "p99"], (round(float(value), 2) for value in np.percentile(values, [50, 95, 99]))))
+
+
+def commit():
+	try:
+		return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+	except OSError:
+		return None
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Glass-to-glass benchmark of laptop_main")
+	parser.add_argument("--cameras", type=int, default=2)
+	parser.add_argument("--width", type=int, default=640)
+	parser.add_argument("--height", type=int, default=480)
+	parser.add_argument("--fps", type=float, default=30)
+	parser.add_argument("--quality", type=int, default=80)
+	parser.add_argument("--telemetry", type=float, default=50, help="Feedback messages per second")
+	parser.add_argument("--mode", default=laptop_main.CAMERA_MODE, help="Camera transport")
+	parser.add_argument("--duration", type=float, default=15.0, help=f"Seconds to run (the last {WINDOW:.0f} are measured)")
+	parser.add_argument("--output", help="File to write the JSON results to")
+	args = parser.parse_args()
+
+	names = [f"Cam {i + 1}" for i in range(args.cameras)]
+	laptop_main.CAM_NAMES = names
+	laptop_main.CAMERA_MODE = synthetic_rover.CAMERA_MODE = args.mode
+
+	# Status messages go to stderr, so stdout is just the results
+	stdout, sys.stdout = sys.stdout, sys.stderr
+
+	# Rover stand-in
+	rover = synthetic_rover.SyntheticRover(names, args.width, args.height, args.fps, args.quality, args.telemetry, False)
+	control = ControlReceive(5001)
+	axis_sock = AxisReceive(5003)
+	axis_latency = [] # (receive time, latency ms)
+
+	def receive_axes():
+		# Axes are stamped with the laptop's `time.monotonic_ns()`, which is the same clock here
+		while rover.running:
+			axes = axis_sock.recv(0.5)
+			if axes is not None:
+				now = time.monotonic_ns()
+				axis_latency.append((now / 1e9, (now - axes["TIME_NS"]) / 1e6))
+
+	threads = [
+		threading.Thread(target=control.run, args=(lambda message: None,), name="rover-control", daemon=True),
+		threading.Thread(target=receive_axes, name="rover-axes", daemon=True),
+		threading.Thread(target=rover.send_telemetry, name="rover-telemetry", daemon=True),
+		threading.Thread(target=rover.send_frames, name="rover-frames", daemon=True),
+	]
+	for thread in threads:
+		thread.start()
+
+	# Measurements at the start and end of the window, taken while every thread is still running
+	samples = []
+	def sample(network_args):
+		img_slots, qc = network_args[4], network_args[5]
+		for at in (args.duration - WINDOW, args.duration - 0.2):
+			time.sleep(max(0, start + at - time.monotonic()))
+			samples.append({
+				"time": time.monotonic(),
+				"cpu": thread_cpu(),
+				"slots": dict((name, slot.stats()) for name, slot in img_slots.items()),
+				"camera": qc.camera.stats(),
+				"sent": dict(rover.sent)
+			})
+
+	def on_start(ah):
+		ah.GamepadManager.gamepads[0] = VirtualGamepad()
+		threading.Thread(target=sample, args=(network_args,), name="bench", daemon=True).start()
+
+	network_args = laptop_main.start_network()
+	start = time.monotonic()
+	report = laptop_main.main_function(*network_args, run_for=args.duration, on_start=on_start)
+
+	rover.stop()
+	control.stop()
+	sys.stdout = stdout
+
+	if len(samples) < 2:
+		sys.exit("Run was too short to measure (duration must be more than the window)")
+	before, after = samples
+	elapsed = after["time"] - before["time"]
+
+	cameras = {}
+	for name in names:
+		slots = dict((key, after["slots"][name][key] - before["slots"][name][key]) for key in after["slots"][name])
+		camera = dict((key, after["camera"][name][key] - before["camera"][name][key]) for key in ("frames", "skipped"))
+		cameras[name] = {
+			"latency_ms": None if report["latency"][name] is None else dict(zip(["p50", "p95", "p99"], (round(value, 2) for value in report["latency"][name]))),
+			"fps": round(slots["displayed"] / elapsed, 2),
+			"sent": after["sent"][name] - before["sent"][name],
+			"received": camera["frames"],
+			"lost": camera["skipped"],
+			"displayed": slots["displayed"],
+			"dropped": slots["dropped"]
+		}
+
+	cpu = dict(
+		(name, round(100 * (after["cpu"][name] - before["cpu"].get(name, 0)) / elapsed, 1))
+		for name in sorted(after["cpu"])
+	)
+
+	results = {
+		"commit": commit(),
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"config": vars(args),
+		"window": round(elapsed, 2),
+		"ui_fps": round(report["loops"] / report["elapsed"], 2),
+		"cameras": cameras,
+		"control": {
+			"latency_ms": percentiles([latency for at, latency in axis_latency if before["time"] <= at <= after["time"]]),
+			"rate": round(report["control"]["rate"], 2),
+			"jitter_p99_ms": round(report["control"]["p99"], 3),
+			"missed": report["control"]["missed"]
+		},
+		"cpu_percent": cpu,
+		"text_cache": report["text"]
+	}
+
+	print(json.dumps(results, indent=2))
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=2)
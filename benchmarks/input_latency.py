@@ -0,0 +1,163 @@
+"""
+Gamepad input latency of the control thread
+
+Attaches an SDL virtual joystick (through pygame's own SDL library, so it goes through the same event
+pumping as a real gamepad) and moves its stick to a new position at random intervals, while the main
+thread runs the UI loop (events, feeds, panels, display update) drawing a new frame for every camera
+each loop, optionally with --stall ms of extra work per frame drawn (eg a slow machine). The
+ControlScheduler samples the stick at CONTROL_RATE, and the time from each move to the first tick
+that sees it is recorded: this is how stale the axes sent to the rover can be.
+
+With --no-pump, MissionControl's extra event pumps are disabled, so the stick is only updated when the
+loop calls `pygame.event.get()` once per frame (how it was before).
+
+Run from the repository root with:
+	python -m benchmarks.input_latency [--cameras N] [--width W] [--height H] [--stall MS] [--duration S] [--no-pump]
+"""
+
+# Import libraries
+import os
+import glob
+import time
+import random
+import ctypes
+import argparse
+import threading
+import numpy as np
+
+# No window, and joystick input even though the (dummy) window never has focus
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("SDL_JOYSTICK_ALLOW_BACKGROUND_EVENTS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+# Import classes
+from classes.MissionControl import MissionControl
+from classes.FeedManager import FeedManager
+from classes.Gamepad import GamepadManager
+from classes.ControlScheduler import ControlScheduler
+from classes.Slots import FrameSlot
+from laptop_main import WIDTH, HEIGHT, CONTROL_RATE
+from synthetic_rover import TestPattern
+
+AXIS = 1 # Left stick vertical, ie driving forward/back
+SDL_JOYSTICK_TYPE_GAMECONTROLLER = 1
+
+
+def load_sdl():
+	"""Returns pygame's SDL library (the one pygame's joysticks are read from)"""
+	libs = glob.glob(os.path.join(os.path.dirname(pygame.__file__), "..", "pygame.libs", "libSDL2*"))
+	sdl = ctypes.CDLL(libs[0]) if libs else ctypes.CDLL("libSDL2-2.0.so.0")
+	sdl.SDL_JoystickAttachVirtual.argtypes = [ctypes.c_int] * 4
+	sdl.SDL_JoystickFromInstanceID.restype = ctypes.c_void_p
+	sdl.SDL_JoystickFromInstanceID.argtypes = [ctypes.c_int32]
+	sdl.SDL_JoystickSetVirtualAxis.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_int16]
+	return sdl
+
+
+class Stick:
+	"""Stand-in for the ActionHandler: records when each stick position is first sampled"""
+	def __init__(self, gm):
+		self.gm = gm
+		self.lock = threading.Lock()
+		self.moved = {} # Position: time it was set
+		self.latency = [] # ms
+
+	def move(self, sdl, joystick, position):
+		with self.lock:
+			self.moved[position] = time.perf_counter()
+		sdl.SDL_JoystickSetVirtualAxis(joystick, AXIS, position * 256)
+
+	def send_axes(self, connected):
+		value = self.gm.get_axis_value(AXIS)
+		if value is None:
+			return
+		position = round(value * 128)
+		with self.lock:
+			moved = self.moved.pop(position, None)
+		if moved is not None:
+			self.latency.append((time.perf_counter() - moved) * 1000)
+
+
+class Connected:
+	def check_connection(self):
+		return True
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Gamepad input latency of the control thread")
+	parser.add_argument("--cameras", type=int, default=6)
+	parser.add_argument("--width", type=int, default=1920)
+	parser.add_argument("--height", type=int, default=1080)
+	parser.add_argument("--stall", type=float, default=0, help="Extra ms of work for each frame drawn")
+	parser.add_argument("--duration", type=float, default=10.0)
+	parser.add_argument("--no-pump", action="store_true", help="Only pump events once per frame")
+	args = parser.parse_args()
+
+	names = [f"Cam {i + 1}" for i in range(args.cameras)]
+	mc = MissionControl(WIDTH, HEIGHT, names)
+	if args.no_pump:
+		mc.pump_input = lambda: None
+	if args.stall:
+		draw_images = mc.draw_images
+		def slow_draw_images(*draw_args):
+			draw_images(*draw_args)
+			end = time.perf_counter() + args.stall / 1000
+			while time.perf_counter() < end:
+				pass
+		mc.draw_images = slow_draw_images
+
+	slots = dict((name, FrameSlot()) for name in names)
+	fm = FeedManager(mc, names, slots)
+	patterns = [TestPattern(name, i, args.width, args.height) for i, name in enumerate(names)]
+	frames = [[pattern.frame(n) for n in range(4)] for pattern in patterns]
+
+	# Virtual gamepad, added the way a JOYDEVICEADDED event would add a real one
+	sdl = load_sdl()
+	index = sdl.SDL_JoystickAttachVirtual(SDL_JOYSTICK_TYPE_GAMECONTROLLER, 6, 11, 1)
+	if index < 0:
+		raise SystemExit("Couldn't attach a virtual joystick")
+	gm = GamepadManager()
+	gm.add_gamepad(index)
+	joystick = ctypes.c_void_p(sdl.SDL_JoystickFromInstanceID(gm.gamepads[0].joystick.get_instance_id()))
+
+	stick = Stick(gm)
+	cs = ControlScheduler(stick, Connected(), CONTROL_RATE)
+	cs.start()
+
+	running = True
+	def move_stick():
+		position = 0
+		while running:
+			time.sleep(random.uniform(0.05, 0.15))
+			position = position % 120 + 1 # A position not already waiting to be seen
+			stick.move(sdl, joystick, position)
+	mover = threading.Thread(target=move_stick, name="stick", daemon=True)
+	mover.start()
+
+	loops, frame_times = 0, []
+	start = time.perf_counter()
+	while time.perf_counter() - start < args.duration:
+		t0 = time.perf_counter()
+		pygame.event.get()
+		for i, name in enumerate(names):
+			slots[name].put(frames[i][loops % 4])
+		fm.get_images()
+		mc.draw_borders()
+		frame_times.append((time.perf_counter() - t0) * 1000) # Drawing only, before the display update and wait
+		mc.update_display()
+		loops += 1
+	elapsed = time.perf_counter() - start
+
+	running = False
+	mover.join()
+	cs.stop()
+
+	latency = np.array(stick.latency)
+	print(f"{args.cameras} cameras at {args.width}x{args.height}, {args.stall:g} ms stall per frame, event pumps {'once per frame' if args.no_pump else 'between stages'}")
+	print(f"UI: {loops / elapsed:.1f} fps, drawing {np.median(frame_times):.1f} ms median, {max(frame_times):.1f} ms max")
+	print(
+		f"Stick move to control tick: {len(latency)} moves, p50 {np.percentile(latency, 50):.1f} ms, "
+		f"p95 {np.percentile(latency, 95):.1f} ms, p99 {np.percentile(latency, 99):.1f} ms, max {latency.max():.1f} ms"
+	)
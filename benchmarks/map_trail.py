@@ -0,0 +1,86 @@
+"""
+Overhead map trail rendering cost
+
+Draws `MissionControl.overhead_map` (offscreen, with SDL's dummy video driver) for a trail of POINTS
+positions from a random walk, adding one position per frame as the feedback would. Reports the time
+per frame once the trail is cached, the time to redraw the whole trail when the zoom changes (and how
+many points the simplified trail kept), and the previous per-frame loop over the trail for smaller
+trails, for comparison.
+
+Run from the repository root with:
+	python -m benchmarks.map_trail
+"""
+
+# Import libraries
+import os
+import time
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+# Import classes
+from classes.MissionControl import MissionControl
+from classes.MapTrail import douglas_peucker
+
+POINTS = 100000
+FRAMES = 500
+OLD_POINTS = [500, 1000, 2000]
+
+
+def random_walk(n, seed=0):
+	"""Trail of a rover wandering about the map at roughly the synthetic rover's speed"""
+	rng = np.random.default_rng(seed)
+	heading = np.cumsum(rng.normal(0, 0.05, n))
+	steps = 0.01 * np.stack([np.cos(heading), np.sin(heading)], axis=1)
+	return np.cumsum(steps, axis=0)
+
+
+def old_overhead_map(mc, pos, trail):
+	"""The trail loop overhead_map used to run every frame"""
+	sf = 2 * mc.vu
+	centre = np.array([sf // 2, sf])
+	for i in range(len(trail) - 1):
+		current = trail[::-1][i]
+		next = trail[::-1][i+1]
+		mc.draw_line(pos + centre + current * sf / 100 * mc.map_info["zoom"], pos + centre + next * sf / 100 * mc.map_info["zoom"], (255, 0, 0))
+
+
+if __name__ == "__main__":
+	mc = MissionControl(1200, 780, ["Cam 1"])
+	pos = np.array([mc.WIDTH - 2 * mc.vu, 2 * mc.vu])
+	walk = random_walk(POINTS + FRAMES)
+
+	trail = mc.map_info["trail"]
+	for point in walk[:POINTS]:
+		trail.append(point)
+
+	t0 = time.perf_counter()
+	mc.overhead_map(pos)
+	print(f"{len(trail)} point trail, first draw: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+	times = []
+	for point in walk[POINTS:]:
+		trail.append(point)
+		mc.map_info["current"] = point
+		t0 = time.perf_counter()
+		mc.overhead_map(pos)
+		times.append(time.perf_counter() - t0)
+	times = np.array(times) * 1000
+	print(f"Per frame (one new position): p50 {np.percentile(times, 50):.3f} ms, p99 {np.percentile(times, 99):.3f} ms")
+
+	for zoom in (0.5, 4):
+		mc.map_info["zoom"] = zoom
+		t0 = time.perf_counter()
+		mc.overhead_map(pos)
+		elapsed = time.perf_counter() - t0
+
+		sf = 2 * mc.vu
+		pixels = trail.to_pixels(trail.points[:len(trail)], np.array([sf // 2, sf]) - 1, sf / 100 * zoom, (0, 0))
+		print(f"Redraw at zoom {zoom}: {elapsed * 1000:.1f} ms, Douglas-Peucker alone keeps {len(douglas_peucker(pixels, 0.5))} of {len(trail)} points")
+
+	for n in OLD_POINTS:
+		points = list(walk[:n])
+		t0 = time.perf_counter()
+		old_overhead_map(mc, pos, points)
+		print(f"Previous loop, {n} point trail: {(time.perf_counter() - t0) * 1000:.1f} ms per frame")
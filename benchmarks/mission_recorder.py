@@ -0,0 +1,89 @@
+"""
+Mission recorder write rate and seek time
+
+Records CAMERAS cameras at SOURCE_FPS (a real 1080p JPEG repeated) plus feedback at FEEDBACK_RATE for
+DURATION seconds, at real timing, into a temporary directory with small segments. Reports the time
+spent in `record` (what the receive side pays), drops and the disk write rate, then opens the recording
+and times random seeks and iterating through every record.
+
+Run from the repository root with:
+	python -m benchmarks.mission_recorder
+"""
+
+# Import libraries
+import cv2
+import json
+import time
+import random
+import shutil
+import tempfile
+import numpy as np
+
+# Import classes
+from classes.MissionRecorder import MissionRecorder, MissionReader, FRAME, FEEDBACK
+
+CAMERAS = 8
+SOURCE_FPS = 30
+FEEDBACK_RATE = 100 # Hz
+DURATION = 5.0 # s
+SEGMENT_SIZE = 64 * 2**20
+SEEKS = 10000
+
+
+def make_jpg():
+	"""Textured 1080p JPEG"""
+	rng = np.random.default_rng(0)
+	frame = cv2.resize(rng.integers(0, 255, (135, 240, 3), dtype=np.uint8), (1920, 1080))
+	return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+
+if __name__ == "__main__":
+	path = tempfile.mkdtemp(prefix="mission-")
+	jpg = make_jpg()
+	feedback = json.dumps({"SPEED": 0.5, "PITCH": 0.01, "ROLL": -0.02, "HEADING": 1.2, "BATTERY": 87}).encode()
+	print(f"{CAMERAS} cameras x {SOURCE_FPS} fps x {len(jpg) / 1000:.0f} kB JPEGs, feedback at {FEEDBACK_RATE} Hz, {DURATION:.0f} s")
+
+	recorder = MissionRecorder(path, segment_size=SEGMENT_SIZE)
+	calls = []
+
+	# Interleave the streams on a shared schedule, as they would arrive from the network loop
+	events = sorted(
+		[(i / SOURCE_FPS, FRAME, f"cam{c}") for i in range(int(DURATION * SOURCE_FPS)) for c in range(CAMERAS)]
+		+ [(i / FEEDBACK_RATE, FEEDBACK, "feedback") for i in range(int(DURATION * FEEDBACK_RATE))]
+	)
+	start = time.perf_counter()
+	for at, kind, name in events:
+		time.sleep(max(0, start + at - time.perf_counter()))
+
+		t0 = time.perf_counter()
+		if kind == FRAME:
+			recorder.record_frame(name, jpg, time.time())
+		else:
+			recorder.record_feedback(feedback, time.time())
+		calls.append(time.perf_counter() - t0)
+	recorder.close()
+	elapsed = time.perf_counter() - start
+
+	calls = np.array(calls) * 1e6
+	stats = recorder.stats()
+	print(f"record() p50 {np.percentile(calls, 50):.1f} us, p99 {np.percentile(calls, 99):.1f} us, max {calls.max():.0f} us")
+	print(f"Recorded {stats['recorded']}, dropped {stats['dropped']}, wrote {stats['written'] / 2**20:.0f} MB at {stats['written'] / 2**20 / elapsed:.0f} MB/s")
+
+	t0 = time.perf_counter()
+	reader = MissionReader(path)
+	print(f"Opened {len(reader)} records in {len(reader.segments)} segments in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+	times = [random.uniform(reader.start, reader.end) for _ in range(SEEKS)]
+	t0 = time.perf_counter()
+	for t in times:
+		record = reader.read(reader.seek(t))
+	print(f"Seek and read: {(time.perf_counter() - t0) / SEEKS * 1e6:.1f} us")
+
+	# Payloads are views into the mapped segments, so iterating doesn't copy the JPEGs
+	t0 = time.perf_counter()
+	count = sum(1 for record in reader.records())
+	print(f"Sequential iteration: {count / (time.perf_counter() - t0):.0f} records/s")
+
+	del record
+	reader.close()
+	shutil.rmtree(path)
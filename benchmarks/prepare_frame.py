@@ -0,0 +1,89 @@
+"""
+Frame preparation cost per resolution
+
+For 480p, 720p and 1080p test-pattern frames, times turning a decoded frame into a surface ready to
+blit into a TILE sized tile: the previous pipeline (fliplr, rot90, cvtColor, resize then
+surfarray.make_surface) against `MissionControl.prepare_frame` scaling into the tile's reused buffer
+and wrapping it with pygame.image.frombuffer. Also reports the bytes allocated per frame, traced with
+tracemalloc (numpy and OpenCV arrays; the pixels of make_surface's surface are allocated by SDL, so
+they are added from the surface's size).
+
+Run from the repository root with:
+	python -m benchmarks.prepare_frame
+"""
+
+# Import libraries
+import os
+import cv2
+import time
+import tracemalloc
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+# Import classes
+from classes.MissionControl import MissionControl
+from synthetic_rover import TestPattern
+
+RESOLUTIONS = {"480p": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+TILE = (672, 362) # Frame area of a tile in the two camera grid
+FRAMES = 200
+
+
+def old_prepare(frame, des_dim):
+	"""The previous pipeline, with the previous des_dim margins already taken off"""
+	frame = cv2.cvtColor(np.rot90(np.fliplr(frame)), cv2.COLOR_BGR2RGB)
+	sf = min(des_dim[0] / frame.shape[0], des_dim[1] / frame.shape[1])
+	frame = cv2.resize(frame, (int(frame.shape[1] * sf), int(frame.shape[0] * sf)))
+	return pygame.surfarray.make_surface(frame)
+
+
+def measure(prepare, frames):
+	"""Median time (ms) and bytes allocated per frame"""
+	prepare(frames[0]) # Warm up (and allocate any reused buffers)
+
+	times = []
+	for frame in frames:
+		t0 = time.perf_counter()
+		prepare(frame)
+		times.append(time.perf_counter() - t0)
+
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	tracemalloc.reset_peak()
+	allocated = 0
+	for frame in frames[:20]:
+		surface = prepare(frame)
+		current, peak = tracemalloc.get_traced_memory()
+		allocated += peak - before
+		tracemalloc.reset_peak()
+		del surface
+	tracemalloc.stop()
+	return np.median(times) * 1000, allocated / 20
+
+
+if __name__ == "__main__":
+	mc = MissionControl(1200, 780, ["Cam 1"])
+	print(f"Tile {TILE[0]}x{TILE[1]}, {FRAMES} frames")
+
+	for label, (width, height) in RESOLUTIONS.items():
+		pattern = TestPattern("Cam 1", 0, width, height)
+		frames = [pattern.frame(i) for i in range(FRAMES)]
+
+		old_time, old_bytes = measure(lambda frame: old_prepare(frame, TILE), frames)
+		surface = old_prepare(frames[0], TILE)
+		old_bytes += surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+		buffer = None
+		def prepare(frame):
+			global buffer
+			buffer = mc.prepare_frame(frame, TILE, buffer)
+			return pygame.image.frombuffer(buffer, (buffer.shape[1], buffer.shape[0]), "BGR")
+		new_time, new_bytes = measure(prepare, frames)
+
+		print(
+			f"{label:>5}: previous {old_time:.2f} ms, {old_bytes / 2**20:.1f} MB per frame | "
+			f"fused {new_time:.2f} ms, {new_bytes / 1024:.1f} kB per frame"
+		)
@@ -0,0 +1,131 @@
+"""
+Loopback throughput benchmark for framed socket receives
+
+Compares, like for like on a blocking socket, the old receive path (growing a `bytes` object with
+`recv(4096)` and slicing off the overflow) against the preallocated `RecvBuffer` filled with
+`recv_into`. The asyncio path that `ReceiveSocket.recv_data` now takes on the network loop
+(`RecvBuffer.read_async`) is reported in its own column, so the event loop's overhead isn't mixed
+into the framing comparison.
+
+Run from the repository root with:
+	python -m benchmarks.socket_framing
+"""
+
+# Import libraries
+import time
+import socket
+import asyncio
+import struct
+import threading
+
+# Import classes
+from classes.Sockets import SocketTimeout, ReceiveSocket, RecvBuffer
+
+# Message sizes to test, and roughly how many bytes to send for each
+SIZES = [1024, 64 * 1024, 1024 * 1024]
+TOTAL_BYTES = 32 * 1024 * 1024
+PAYLOAD_STRING = "<Id" # 32 bit size so that 1 MB messages fit in the header
+
+
+class LegacyReceiveSocket:
+	"""The previous (threaded, blocking) `recv_data` implementation, kept here for comparison"""
+
+	def __init__(self, conn, payload_string):
+		self.conn = conn
+		self.overflow = b""
+		self.payload_size = struct.calcsize(payload_string)
+
+	def recv_data(self, size=None):
+		if size is None:
+			size = self.payload_size
+
+		data = self.overflow
+		while len(data) < size:
+			try:
+				data += self.conn.recv(4096)
+			except ConnectionResetError:
+				raise SocketTimeout("Receive: Connection reset")
+
+		self.overflow = data[size:]
+		return data[:size]
+
+
+def send_messages(conn, size, count):
+	"""Send `count` framed messages of `size` bytes"""
+	message = struct.pack(PAYLOAD_STRING, size, time.time()) + bytes(size)
+	for _ in range(count):
+		conn.sendall(message)
+
+
+class BufferReceiveSocket:
+	"""`RecvBuffer.read` on a blocking socket, with the same interface as `LegacyReceiveSocket`"""
+
+	def __init__(self, conn, payload_string):
+		self.conn = conn
+		self.buffer = RecvBuffer()
+		self.payload_size = struct.calcsize(payload_string)
+
+	def recv_data(self, size=None):
+		return self.buffer.read(self.conn, self.payload_size if size is None else size)
+
+
+def run_blocking(receiver_class, size):
+	"""Returns the throughput (MB/s) of receiving framed messages of `size` bytes on a blocking socket"""
+	count = max(16, TOTAL_BYTES // size)
+	send_conn, recv_conn = socket.socketpair()
+	receiver = receiver_class(recv_conn, PAYLOAD_STRING)
+
+	sender = threading.Thread(target=send_messages, args=(send_conn, size, count), daemon=True)
+	start_time = time.perf_counter()
+	sender.start()
+
+	for _ in range(count):
+		header = struct.unpack(PAYLOAD_STRING, receiver.recv_data())
+		receiver.recv_data(header[0])
+
+	elapsed = time.perf_counter() - start_time
+	sender.join()
+	send_conn.close()
+	recv_conn.close()
+
+	return count * size / elapsed / 1e6
+
+
+async def receive_messages(receiver, count):
+	for _ in range(count):
+		header = struct.unpack(PAYLOAD_STRING, await receiver.recv_data())
+		await receiver.recv_data(header[0])
+
+
+def run_async(size):
+	"""Returns the throughput (MB/s) of receiving framed messages of `size` bytes with `ReceiveSocket` on an event loop"""
+	count = max(16, TOTAL_BYTES // size)
+	send_conn, recv_conn = socket.socketpair()
+	recv_conn.setblocking(False)
+
+	receiver = ReceiveSocket(0, PAYLOAD_STRING)
+	receiver.loop = asyncio.new_event_loop()
+	receiver.conn = recv_conn
+
+	sender = threading.Thread(target=send_messages, args=(send_conn, size, count), daemon=True)
+	start_time = time.perf_counter()
+	sender.start()
+
+	receiver.loop.run_until_complete(receive_messages(receiver, count))
+
+	elapsed = time.perf_counter() - start_time
+	sender.join()
+	receiver.loop.close()
+	send_conn.close()
+	recv_conn.close()
+
+	return count * size / elapsed / 1e6
+
+
+if __name__ == "__main__":
+	print(f"{'size':>10} {'old (MB/s)':>12} {'buffer (MB/s)':>14} {'speedup':>8} {'asyncio (MB/s)':>15} {'vs old':>7}")
+	for size in SIZES:
+		old = run_blocking(LegacyReceiveSocket, size)
+		new = run_blocking(BufferReceiveSocket, size)
+		loop = run_async(size)
+		print(f"{size:>10} {old:>12.1f} {new:>14.1f} {new / old:>7.1f}x {loop:>15.1f} {loop / old:>6.1f}x")
@@ -0,0 +1,149 @@
+"""
+Stream quality loop against a radio link that degrades
+
+A rover stand-in captures 640x480 frames at SOURCE_FPS, encodes them with a `StreamShaper` and sends
+them to a `CameraReceive` over a simulated link: a queue drained at `capacity` bytes/s, which drops from
+HIGH to LOW after DEGRADE_AT seconds. Like the ZMQ high-water mark, the queue holds at most
+CAMERA_HWM frames and sending blocks when it is full. A `QualityController` reads the measurements and its targets are
+given straight to the shaper (in place of the control channel). A reader thread displays frames at 60
+Hz, like the UI.
+
+Prints the budget, throughput, mean frame age and level once per update, then how long the frame age
+took to recover after the link degraded.
+
+Run from the repository root with:
+	python -m benchmarks.stream_quality
+"""
+
+# Import libraries
+import cv2
+import time
+import queue
+import threading
+import numpy as np
+
+# Import classes
+from classes.Slots import FrameSlot
+from classes.LinkStats import LinkStats
+from classes.NetworkLoop import NetworkLoop
+from classes.Sockets import CameraReceive, CameraSend, PUSH_PULL, CAMERA_HWM
+from classes.StreamQuality import QualityController, StreamShaper
+
+SOURCE_FPS = 30
+HIGH, LOW = 1.5e6, 150e3 # Link capacity (bytes/s)
+DEGRADE_AT = 6.0 # s
+DURATION = 14.0 # s
+PORT = 5952
+
+
+def make_frame(i):
+	"""Textured test frame that moves, so JPEG sizes are realistic"""
+	rng = np.random.default_rng(i % 10)
+	noise = rng.integers(0, 40, (480, 640, 3), dtype=np.uint8)
+	x = np.arange(640, dtype=np.uint16)
+	row = ((x + 6 * i) % 256).astype(np.uint8)
+	return np.repeat(np.tile(row, (480, 1))[:, :, None], 3, axis=2) + noise
+
+
+class Rover:
+	"""Captures, shapes and sends frames through a link that drains at `capacity` bytes/s"""
+	def __init__(self, shaper):
+		self.shaper = shaper
+		self.capacity = HIGH
+		self.link = queue.Queue(CAMERA_HWM)
+		self.running = True
+		self.frames = [make_frame(i) for i in range(30)]
+
+	def capture(self):
+		i = 0
+		next_frame = time.perf_counter()
+		while self.running:
+			jpg = self.shaper.encode("cam", self.frames[i % len(self.frames)])
+			if jpg is not None:
+				self.link.put(({"name": "cam", "time": time.time()}, jpg))
+			i += 1
+
+			next_frame = max(next_frame + 1 / SOURCE_FPS, time.perf_counter())
+			time.sleep(max(0, next_frame - time.perf_counter()))
+		self.link.put((None, None))
+
+	def transmit(self):
+		sender = CameraSend(f"tcp://localhost:{PORT}", PUSH_PULL)
+		while True:
+			msg, jpg = self.link.get()
+			if msg is None:
+				break
+			time.sleep(len(jpg) / self.capacity)
+			sender.send_jpg(msg, jpg)
+		sender.close()
+
+
+def display(slot, stop):
+	"""Read frames at 60 Hz, like the UI"""
+	sequence = 0
+	while not stop.is_set():
+		_, sequence, _ = slot.get(sequence)
+		time.sleep(1 / 60)
+
+
+if __name__ == "__main__":
+	slot = FrameSlot()
+	slot.target = (584, 352)
+	slots = {"cam": slot}
+
+	network = NetworkLoop()
+	link = LinkStats()
+	camera = CameraReceive(slots, f"tcp://*:{PORT}", link=link, mode=PUSH_PULL)
+	network.add(camera)
+	network.start()
+
+	shaper = StreamShaper()
+	rover = Rover(shaper)
+	stop = threading.Event()
+	threads = [
+		threading.Thread(target=rover.capture),
+		threading.Thread(target=rover.transmit),
+		threading.Thread(target=display, args=(slot, stop)),
+	]
+	for thread in threads:
+		thread.start()
+
+	qc = QualityController(camera, slots)
+	print(f"{'t (s)':>6}{'link kB/s':>10}{'budget':>8}{'thru':>8}{'age ms':>8}{'level':>6}")
+
+	start = time.monotonic()
+	recovered = None
+	previous = camera.stats()["cam"]
+	while (now := time.monotonic()) - start < DURATION:
+		if now - start > DEGRADE_AT:
+			rover.capacity = LOW
+
+		targets = qc.update(now)
+		if targets is not None:
+			shaper.set_targets(targets)
+
+		current = camera.stats()["cam"]
+		if current is not previous and now - qc.last_update < 0.05:
+			aged = current["aged"] - previous["aged"]
+			age = (current["age"] - previous["age"]) / aged if aged else float("nan")
+			previous = current
+
+			stats = qc.stats()
+			print(f"{now - start:6.1f}{rover.capacity / 1000:10.0f}{stats['budget']:8.0f}{stats['throughput']:8.0f}{age * 1000:8.0f}{stats['levels']['cam']:6}")
+
+			if now - start > DEGRADE_AT:
+				if age < qc.max_age and recovered is None:
+					recovered = now - start - DEGRADE_AT
+				elif age >= qc.max_age:
+					recovered = None
+
+		time.sleep(0.05)
+
+	rover.running = False
+	stop.set()
+	for thread in threads:
+		thread.join()
+	network.stop()
+
+	print()
+	print(f"Frame age recovered {recovered:.1f}s after the link degraded" if recovered is not None else "Frame age did not recover")
@@ -0,0 +1,76 @@
+"""
+Telemetry history append and downsampling cost
+
+Fills a TelemetryHistory with an hour of feedback at RATE Hz (the synthetic rover's fields), timing
+`append`, then times downsampling windows from a minute to the whole hour into WIDTH buckets (one per
+pixel of a plot), checks the buckets against a plain per-bucket loop, and compares with keeping the
+history in a list of dicts.
+
+Run from the repository root with:
+	python -m benchmarks.telemetry_history
+"""
+
+# Import libraries
+import time
+import numpy as np
+
+# Import classes
+from classes.TelemetryHistory import TelemetryHistory
+from synthetic_rover import Telemetry
+
+RATE = 50 # Hz
+DURATION = 3600 # s
+WIDTH = 400 # Buckets
+REPEATS = 20
+FIELDS = ["speed", "elevation", "pitch", "roll", "heading", "battery", "voltage", "current"]
+
+
+def timed(function, repeats=REPEATS):
+	"""Best time (ms) of several calls"""
+	best = float("inf")
+	for _ in range(repeats):
+		t0 = time.perf_counter()
+		function()
+		best = min(best, time.perf_counter() - t0)
+	return best * 1000
+
+
+if __name__ == "__main__":
+	samples = int(RATE * DURATION)
+	history = TelemetryHistory(FIELDS, samples)
+	telemetry = Telemetry()
+
+	# Messages are generated first so only the appends are timed
+	messages = [telemetry.feedback() for _ in range(samples)]
+	start = time.time() - DURATION
+
+	t0 = time.perf_counter()
+	for i, fb in enumerate(messages):
+		history.append(fb, start + i / RATE)
+	elapsed = time.perf_counter() - t0
+	print(f"append: {elapsed / samples * 1e6:.2f} us per message ({samples} messages, {len(FIELDS)} fields)")
+	print(f"Buffer: {(history.times.nbytes + history.values.nbytes) / 2**20:.1f} MB")
+
+	for span in (60, 600, DURATION):
+		ms = timed(lambda: history.downsample("speed", WIDTH, span))
+		print(f"downsample {span:>4}s ({int(span * RATE):>6} samples) into {WIDTH} buckets: {ms:.2f} ms")
+
+	# Check against a plain loop over the buckets
+	centres, mins, maxs, means = history.downsample("speed", WIDTH, 600)
+	edges = np.linspace(history.times[history.next - 1] - 600, history.times[history.next - 1], WIDTH + 1)
+	times, values = history.window("speed", edges[0], edges[-1])
+	for i in range(WIDTH):
+		last = i == WIDTH - 1
+		bucket = values[(times >= edges[i]) & ((times <= edges[i + 1]) if last else (times < edges[i + 1]))]
+		assert np.isclose(mins[i], bucket.min()) and np.isclose(maxs[i], bucket.max()) and np.isclose(means[i], bucket.mean(), atol=1e-5)
+	print("Buckets match a per-bucket loop")
+
+	# The same hour kept as a list of dicts, reduced with a loop over the samples
+	rows = [(start + i / RATE, fb["speed"]) for i, fb in enumerate(messages)]
+	def python_downsample():
+		first, last = rows[0][0], rows[-1][0]
+		buckets = [[] for _ in range(WIDTH)]
+		for t, value in rows:
+			buckets[min(WIDTH - 1, int((t - first) / (last - first) * WIDTH))].append(value)
+		return [(min(b), max(b), sum(b) / len(b)) for b in buckets if b]
+	print(f"list of dicts, {DURATION}s: {timed(python_downsample, 3):.1f} ms")
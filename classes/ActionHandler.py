@@ -1,10 +1,11 @@
 # Import libraries
 import json
 import pygame
-import datetime
 import numpy as np
 from enum import IntEnum
 
+from classes.Sockets import QUEUE
+
 # Button and axis indicies (may need to change order depending on controller/ OS)
 class Axes(IntEnum):
 	L_HOR=0
@@ -42,6 +43,18 @@ TEST_KEYBIND_2 = [pygame.K_g, Buttons.B]
 TEST_KEYBIND_3 = [pygame.K_h, Buttons.X]
 MAP_ZOOM_IN = [pygame.K_i]
 MAP_ZOOM_OUT = [pygame.K_o]
+LAYOUT_NEXT = [pygame.K_l, Buttons.Y] # Camera feeds: grid, focus plus strip, picture-in-picture
+FOCUS_NEXT = [pygame.K_n, Buttons.START] # Camera shown large (clicking a feed also focuses it)
+
+# What ControlSend does with each command while the rover is disconnected (anything not listed is dropped)
+COMMAND_POLICY = {
+	"TEST BUTTON 2": QUEUE,
+	"TEST BUTTON 3": QUEUE,
+}
+
+# Feedback fields shown in the telemetry and system panels
+TELEMETRY_FIELDS = ["speed", "elevation", "pitch", "roll", "heading"]
+SYSTEM_FIELDS = ["battery", "voltage", "current"]
 
 # Labels and rover commands for on screen buttons
 onscreen_commands = [
@@ -53,12 +66,14 @@ class ActionHandler:
 	"""
 	Handles button presses, axis movements, etc and sends information to rover
 	"""
-	def __init__(self, send_socket, mc, fm, gm):
+	def __init__(self, send_socket, axis_socket, mc, fm, gm):
 		"""
 		Parameters
 		----------
 		send_socket : ControlSend
-			Socket for sending control messages to rover
+			Socket for sending discrete control messages to rover (reliable, TCP)
+		axis_socket : AxisSend
+			Socket for sending continuous axis values to rover (latest-wins, UDP)
 		mc : MissionControl
 			The MissionControl object that handles the pygame window
 		fm : FeedManager
@@ -67,6 +82,7 @@ class ActionHandler:
 			The GamepadManager object that handles all connected gamepads
 		"""
 		self.sock = send_socket
+		self.axis_sock = axis_socket
 		self.MissionControl = mc
 		self.FeedManager = fm
 		self.GamepadManager = gm
@@ -86,15 +102,13 @@ class ActionHandler:
 		msg : dict
 			List of commands to be sent to rover
 		"""
-		# Add current time to dict
-		msg["TIME"] = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-
-		# Run socket method which converts to JSON and sends
+		# Run socket method which timestamps, encodes with the negotiated codec and sends
 		self.sock.send(msg)
 
 	def send_axes(self, conn=True):
 		"""
-		Sends the value of an axis if it isn't zero
+		Sends the current value of every drive axis over the UDP axis channel. The full state is sent
+		each time (not just changes), so a lost datagram is corrected by the next one
 
 		Parameters
 		----------
@@ -103,76 +117,58 @@ class ActionHandler:
 		"""
 		msg = {}
 
-		# Loop over each gamepad
+		# Loop over each axis
 		for axis in range(6):
 			# Get value of axis
 			value = self.GamepadManager.get_axis_value(axis)
 			if value == None: return None
 
 			# Joystick
-			if axis in [Axes.L_HOR, Axes.L_VER, Axes.R_HOR, Axes.R_VER]:
-				# Check movement is further than the deadzone
+			if axis in [Axes.L_VER, Axes.R_HOR]:
+				# Measure movement past the deadzone (need to account for positive and negative value)
 				if abs(value) > DEADZONE:
-					# Measure movement past the deadzone (need to account for positive and negative value)
 					value = min([value - DEADZONE, value + DEADZONE], key=abs) / (1 - DEADZONE)
-					
-					# Forwards/ backwards
-					if axis == Axes.L_VER:
-						self.axis_buffer[Axes.L_VER] = -value
-						msg["FORWARD"] = -value # Note: up on joystick is negative so we invert this
-					
-					# Turning
-					elif axis == Axes.R_HOR:
-						self.axis_buffer[Axes.R_HOR] = value
-						msg["TURN"] = value
-
-				elif self.axis_buffer[axis] != 0:
-					# If value is zero, make sure to send that to rover
-					if axis == Axes.L_VER: 
-						msg["FORWARD"] = 0
-						self.axis_buffer[axis] = 0
-					elif axis == Axes.L_VER: 
-						msg["TURN"] = 0
-						self.axis_buffer[axis] = 0
+				else:
+					value = 0
+
+				# Forwards/ backwards
+				if axis == Axes.L_VER:
+					value = -value # Note: up on joystick is negative so we invert this
+					msg["FORWARD"] = value
+
+				# Turning
+				else:
+					msg["TURN"] = value
 
 			# Trigger
 			elif axis in [Axes.L_TRIG, Axes.R_TRIG]:
 				# Convert range from (-1, 1) to (0, 1)
 				value = (value + 1) / 2
 
-				# Check movement is further than the deadzone
+				# Measure movement past the deadzone 
 				if value > DEADZONE:
-					# Measure movement past the deadzone 
 					value = (value - DEADZONE) / (1 - DEADZONE)
+				else:
+					value = 0
 
-					# Left Trigger 
-					if axis == Axes.L_TRIG:
-						# Invert if left bumper is held
-						if self.GamepadManager.get_button_state(0, Buttons.LB):
-							value *= -1
-
-						self.axis_buffer[Axes.L_TRIG] = value
-						msg["L_TRIG"] = value # [temp name]
+				# Left Trigger (inverted if left bumper is held)
+				if axis == Axes.L_TRIG:
+					if self.GamepadManager.get_button_state(0, Buttons.LB):
+						value *= -1
+					msg["L_TRIG"] = value # [temp name]
 
-					# Right Trigger 
-					elif axis == Axes.R_TRIG:
-						# Invert if right bumper is held
-						if self.GamepadManager.get_button_state(0, Buttons.RB):
-							value *= -1
+				# Right Trigger (inverted if right bumper is held)
+				else:
+					if self.GamepadManager.get_button_state(0, Buttons.RB):
+						value *= -1
+					msg["R_TRIG"] = value # [temp name]
 
-						self.axis_buffer[Axes.R_TRIG] = value
-						msg["R_TRIG"] = value # [temp name]
+			else:
+				continue
 
-				elif self.axis_buffer[axis] != 0:
-					# If value is zero, make sure to send that to rover
-					if axis == Axes.L_TRIG: 
-						msg["L_TRIG"] = 0
-						self.axis_buffer[axis] = 0
-					elif axis == Axes.R_TRIG: 
-						msg["R_TRIG"] = 0
-						self.axis_buffer[axis] = 0
+			self.axis_buffer[axis] = value
 
-		if conn and msg: self.send_msg(msg)
+		if conn: self.axis_sock.send(msg)
 
 	def button_press(self, button, down=True):
 		"""All the actions to be carried out after a button is pressed"""
@@ -195,7 +191,12 @@ class ActionHandler:
 			self.MissionControl.map_info["zoom"] -= 0.2
 			print(f"Zoom: {self.MissionControl.map_info['zoom']}")
 
-	def handle_events(self, events, conn=True) -> bool:
+		elif down and button in LAYOUT_NEXT:
+			self.MissionControl.next_layout()
+		elif down and button in FOCUS_NEXT:
+			self.MissionControl.focus_feed()
+
+	def handle_events(self, events) -> bool:
 		"""
 		Handles any pygame event (eg button presses, quitting) and returns whether to quit or not
 
@@ -203,8 +204,6 @@ class ActionHandler:
 		----------
 		events : list[Event]
 			Instance of the list `pygame.event.get()`
-		conn : bool
-			Whether the send socket is connected or not 
 		"""
 		done = False
 		msg = {}
@@ -239,33 +238,54 @@ class ActionHandler:
 				self.GamepadManager.remove_gamepad(event.instance_id)
 				print("Gamepad disconnected")
 
-			# On screen button presses
-			elif event.type == pygame.MOUSEBUTTONDOWN:
+			# Window uncovered or restored (only changed parts of the screen are normally updated)
+			elif event.type in [pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED]:
+				self.MissionControl.invalidate()
+
+			# On screen button presses (left clicks only, as the scroll wheel also sends MOUSEBUTTONDOWN)
+			elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
 				x, y = pygame.mouse.get_pos()
 
-				for i in range(16):
-					bb = self.MissionControl.actions_info["bboxes"][i] # Bounding box
-					if bb[0] < x and bb[1] < y and x < bb[2] and y < bb[3]:
-						command = onscreen_commands[i][1]
-						break
+				# Clicking a camera feed shows it large
+				name = self.MissionControl.layout.tile_at((x, y))
+				if name is not None:
+					self.MissionControl.focus_feed(name)
+
+				# Button under the mouse, worked out from the grid's geometry
+				i = self.MissionControl.buttons.index_at((x, y))
+				if i is not None and i < len(onscreen_commands):
+					command = onscreen_commands[i][1]
 
 
 			# If there was a command, append it to msg
 			if command: msg[command[0]] = command[1]
 
-		# If connected and msg list isn't empty, send commands
-		if conn and msg: self.send_msg(msg)
+		# If msg list isn't empty, send commands (while disconnected, ControlSend queues or drops them by COMMAND_POLICY)
+		if msg: self.send_msg(msg)
 		return done
 	
-	def handle_feedback(self, fb:dict):
-		W, vu = self.MissionControl.get_width_vu()
-
-		# Loop over feedback (it is a dict, unless type that is sent has been changed rover_main): 
-		# - replace values in *_info parameters in MissionControl
-		# - then run the functions below
-
-		self.overhead_map(np.array([W - 2 * vu, 2 * vu]))
-		self.scoop_status(np.array([W - 4 * vu, 4 * vu]))
-		self.telemetry(np.array([W - 4 * vu, 2 * vu]))
-		self.system(np.array([W - 4 * vu, 0]))
-		self.actions(np.array([W - 2 * vu, 0]))
\ No newline at end of file
+	def handle_feedback(self, values:dict, events:list):
+		"""
+		Copies the latest feedback from the rover into MissionControl so it is drawn on the next frame
+
+		Parameters
+		----------
+		values : dict
+			Feedback fields that have changed since the last frame (from `TelemetryStore.snapshot`)
+		events : list
+			(field, value) events received since the last frame
+		"""
+		for key, value in values.items():
+			if key in TELEMETRY_FIELDS:
+				self.MissionControl.telemetry_info[key] = value
+			elif key in SYSTEM_FIELDS:
+				self.MissionControl.system_info[key] = value
+			elif key == "position":
+				# Move the rover on the overhead map (every position is added to the trail by the TelemetryStore)
+				self.MissionControl.map_info["current"] = np.array(value)
+
+			if key == "heading":
+				self.MissionControl.map_info["heading"] = value
+
+		for key, value in events:
+			print(f"Rover {key}: {value}")
@@ -0,0 +1,95 @@
+# Import libraries
+import pygame
+
+MARGIN = (15, 10) # Space (x, y) between the edge of the panel and the buttons
+GAP = 5 # Space between buttons
+
+class ButtonGrid:
+	"""
+	Grid of on screen buttons, drawn onto a cached surface.
+
+	The surface is only redrawn when the panel's size, the labels or the button states change, so
+	drawing the panel is one blit however many buttons there are. Buttons are evenly spaced, so the
+	button under a point is worked out from the grid's geometry instead of checking every button.
+	"""
+	def __init__(self, rows=4, cols=4, text=None):
+		"""
+		Parameters
+		----------
+		rows, cols : int
+			Grid shape (buttons are numbered along each row)
+		text : TextCache
+			Cache the labels are rendered with
+		"""
+		self.rows = rows
+		self.cols = cols
+		self.text = text
+
+		self.rect = pygame.Rect(0, 0, 0, 0)
+		self.size = 0 # Width and height of each button
+		self.surface = None
+		self.key = None # (size, labels, states) the surface was drawn for
+
+	def __len__(self):
+		return self.rows * self.cols
+
+	def place(self, rect):
+		"""Fit the grid into an area of the screen"""
+		self.rect = pygame.Rect(rect)
+		self.size = max(1, min(
+			(self.rect.width - 2 * MARGIN[0] - (self.cols - 1) * GAP) // self.cols,
+			(self.rect.height - 2 * MARGIN[1] - (self.rows - 1) * GAP) // self.rows
+		))
+
+	def cell(self, index) -> pygame.Rect:
+		"""Returns a button's rectangle, relative to the grid's area"""
+		row, col = divmod(index, self.cols)
+		return pygame.Rect(MARGIN[0] + (self.size + GAP) * col, MARGIN[1] + (self.size + GAP) * row, self.size, self.size)
+
+	def render(self, labels:"list[str]", states:list) -> pygame.Surface:
+		"""
+		Returns the grid drawn on a surface, redrawing it if the labels or states have changed
+
+		Parameters
+		----------
+		labels : list[str]
+			Label of each button
+		states : list
+			State of each button (buttons with a true state are highlighted)
+		"""
+		key = (self.rect.size, tuple(labels), tuple(states))
+		if key == self.key:
+			return self.surface
+		self.key = key
+
+		if self.surface is None or self.surface.get_size() != self.rect.size:
+			self.surface = pygame.Surface(self.rect.size)
+		self.surface.fill((0, 0, 0))
+
+		# Labels are shrunk to fit small buttons (eg large command palettes)
+		font_size = max(8, min(16, int(self.size / 3)))
+
+		for index in range(len(self)):
+			border = self.cell(index)
+			if states[index]:
+				pygame.draw.rect(self.surface, (70, 70, 70), border)
+			pygame.draw.rect(self.surface, (255, 255, 255), border, 1)
+
+			if labels[index]:
+				text = self.text.render(labels[index], font_size)
+				self.surface.blit(text, text.get_rect(center=border.center))
+
+		return self.surface
+
+	def index_at(self, pos):
+		"""Returns the index of the button at a point on the screen, or None if there isn't one"""
+		x = pos[0] - self.rect.left - MARGIN[0]
+		y = pos[1] - self.rect.top - MARGIN[1]
+		if x < 0 or y < 0:
+			return None
+
+		col, x = divmod(x, self.size + GAP)
+		row, y = divmod(y, self.size + GAP)
+		if col >= self.cols or row >= self.rows or x >= self.size or y >= self.size:
+			return None # Outside the grid or in the gap between buttons
+		return row * self.cols + col
@@ -0,0 +1,120 @@
+# Import libraries
+import json
+import time
+import struct
+import datetime
+
+# Axis fields that have a fixed slot in the binary encoding (the order sets the bit in the mask)
+AXIS_FIELDS = ["FORWARD", "TURN", "L_TRIG", "R_TRIG"]
+AXIS_BITS = dict((name, i) for i, name in enumerate(AXIS_FIELDS))
+
+# Mask bit set when the rest of the body is a JSON object of ad-hoc commands
+EXTENSION = 0x80
+
+class JsonCodec:
+	"""
+	Original encoding: `"<Hd"` header (message size and `time.time()`) followed by a JSON object.
+	Always available, so it is used as the fallback if the rover doesn't agree to anything else
+	"""
+	name = "json"
+
+	def __init__(self, payload_string="<Hd"):
+		self.header = struct.Struct(payload_string)
+
+	def encode(self, message:dict) -> bytes:
+		"""Add the time to a message and return the encoded bytes (including header)"""
+		message = dict(message, TIME=datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3])
+		encoded_message = json.dumps(message).encode()
+
+		return self.header.pack(len(encoded_message), time.time()) + encoded_message
+
+	def body_size(self, header:tuple) -> int:
+		"""Number of bytes following the header"""
+		return header[0]
+
+	def decode(self, header:tuple, body) -> dict:
+		"""Decode a message body (bytes or memoryview) after the header has been unpacked"""
+		return json.loads(str(body, "utf-8"))
+
+class BinaryCodec:
+	"""
+	Compact encoding for control messages.
+
+	Header is `"<HQB"`: body size, `time.monotonic_ns()` and a mask of which `AXIS_FIELDS` are present.
+	The body is one float32 for each set bit (in `AXIS_FIELDS` order), then, if the `EXTENSION` bit is
+	set, a JSON object holding any other commands (eg "QUIT_ROVER")
+	"""
+	name = "bin1"
+
+	def __init__(self):
+		self.header = struct.Struct("<HQB")
+
+		# Precompiled layouts for every combination of axis fields
+		self.layouts = [
+			struct.Struct("<HQB" + "f" * bin(mask).count("1"))
+			for mask in range(1 << len(AXIS_FIELDS))
+		]
+		self.values = [struct.Struct("<" + "f" * n) for n in range(len(AXIS_FIELDS) + 1)]
+
+	def encode(self, message:dict) -> bytes:
+		"""Return the encoded bytes (including header) of a message"""
+		mask = 0
+		values = [None] * len(AXIS_FIELDS)
+		extension = None
+
+		for key, value in message.items():
+			bit = AXIS_BITS.get(key)
+			if bit is None:
+				if extension is None:
+					extension = {}
+				extension[key] = value
+			else:
+				mask |= 1 << bit
+				values[bit] = value
+
+		values = [value for value in values if value is not None]
+		encoded_extension = json.dumps(extension).encode() if extension else b""
+		size = 4 * len(values) + len(encoded_extension)
+
+		if encoded_extension:
+			return self.layouts[mask].pack(size, time.monotonic_ns(), mask | EXTENSION, *values) + encoded_extension
+		else:
+			return self.layouts[mask].pack(size, time.monotonic_ns(), mask, *values)
+
+	def body_size(self, header:tuple) -> int:
+		"""Number of bytes following the header"""
+		return header[0]
+
+	def decode(self, header:tuple, body) -> dict:
+		"""Decode a message body (bytes or memoryview) after the header has been unpacked"""
+		_, time_ns, mask = header
+		fields = [name for i, name in enumerate(AXIS_FIELDS) if mask & (1 << i)]
+
+		values_layout = self.values[len(fields)]
+		message = dict(zip(fields, values_layout.unpack_from(body)))
+
+		if mask & EXTENSION:
+			message.update(json.loads(str(body[values_layout.size:], "utf-8")))
+
+		message["TIME_NS"] = time_ns
+		return message
+
+# Supported codecs, in order of preference
+CODECS = {
+	BinaryCodec.name: BinaryCodec(),
+	JsonCodec.name: JsonCodec(),
+}
+
+def choose_codec(offered:"list[str]") -> str:
+	"""
+	Rover side of the negotiation: pick the most preferred codec that the laptop offered
+
+	Parameters
+	----------
+	offered : list[str]
+		Codec names from the laptop's "HELLO" message
+	"""
+	for name in CODECS:
+		if name in offered:
+			return name
+	return JsonCodec.name
@@ -0,0 +1,91 @@
+# Import libraries
+import time
+import threading
+from collections import deque
+
+class ControlScheduler:
+	"""
+	Samples the gamepad and sends the axis state at a fixed rate on its own thread, so driving
+	commands are sent on time however long the UI takes to draw a frame.
+
+	SDL only updates the joystick state when the main thread pumps events, so how fresh the sampled
+	axes are depends on the main loop: MissionControl pumps between feeds, before updating the display
+	and every INPUT_POLL while waiting for the next frame
+	"""
+	def __init__(self, ah, send_socket, rate=100, window=500):
+		"""
+		Parameters
+		----------
+		ah : ActionHandler
+			The ActionHandler used to sample and send the axes
+		send_socket : ControlSend
+			Control socket (axes are only sent while it is connected)
+		rate : float
+			Control rate in Hz
+		window : int
+			Number of recent ticks to calculate jitter statistics over
+		"""
+		self.ah = ah
+		self.sock = send_socket
+		self.period = 1 / rate
+
+		self.running = False
+		self.thread = None
+
+		# Time between consecutive ticks
+		self.lock = threading.Lock()
+		self.intervals = deque(maxlen=window)
+		self.missed = 0
+
+	def start(self):
+		self.running = True
+		self.thread = threading.Thread(target=self.run, name="control", daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.running = False
+		if self.thread is not None:
+			self.thread.join()
+
+	def run(self):
+		"""Tick at a fixed rate, scheduling against absolute deadlines so that errors don't accumulate"""
+		deadline = time.perf_counter()
+		previous = None
+
+		while self.running:
+			now = time.perf_counter()
+			if previous is not None:
+				with self.lock:
+					self.intervals.append(now - previous)
+			previous = now
+
+			self.ah.send_axes(self.sock.check_connection())
+
+			deadline += self.period
+			remaining = deadline - time.perf_counter()
+			if remaining > 0:
+				time.sleep(remaining)
+			elif remaining < -self.period:
+				# Fell more than a whole period behind, so skip the missed ticks instead of bursting
+				self.missed += int(-remaining // self.period)
+				deadline = time.perf_counter()
+
+	def stats(self) -> dict:
+		"""
+		Returns jitter statistics over the recent ticks: achieved rate (Hz), mean, p99 and max absolute
+		deviation from the target period (ms), and the total number of missed ticks
+		"""
+		with self.lock:
+			intervals = list(self.intervals)
+
+		if not intervals:
+			return {"rate": 0, "mean": 0, "p99": 0, "max": 0, "missed": self.missed}
+
+		errors = sorted(abs(interval - self.period) * 1000 for interval in intervals)
+		return {
+			"rate": len(intervals) / sum(intervals),
+			"mean": sum(errors) / len(errors),
+			"p99": errors[min(len(errors) - 1, int(0.99 * len(errors)))],
+			"max": errors[-1],
+			"missed": self.missed
+		}
@@ -32,7 +32,7 @@ class GamepadManager:
 		id : int
 			The gamepad instance id 
 		"""
-		del self.gamepads[id]
+		self.gamepads.pop(id, None)
 
 	def get_button_state(self, id:int, button:int):
 		"""
@@ -45,10 +45,12 @@ class GamepadManager:
 		button : int
 			The index of the button
 		"""
-		if not self.gamepads:
+		# Gamepads can be removed by the UI thread while the control thread is reading them
+		gamepad = self.gamepads.get(id)
+		if gamepad is None:
 			return False
 		else:
-			return self.gamepads[id].joystick.get_button(button)
+			return gamepad.joystick.get_button(button)
 
 	def get_axis_value(self, axis:int):
 		"""
@@ -59,10 +61,11 @@ class GamepadManager:
 		axis : int
 			The index of the axis
 		"""
-		if not self.gamepads:
+		gamepad = self.gamepads.get(0)
+		if gamepad is None:
 			return None
 		else:
-			return self.gamepads[0].joystick.get_axis(axis)
+			return gamepad.joystick.get_axis(axis)
 
 class Gamepad:
 	"""
@@ -0,0 +1,158 @@
+# Import libraries
+import math
+import pygame
+
+# Layout modes
+GRID = "grid" # Every feed the same size
+FOCUS = "focus" # The focused feed large, with the rest in a strip below it
+PIP = "pip" # The focused feed filling the area, with the rest inset in its bottom right corner (picture-in-picture)
+MODES = [GRID, FOCUS, PIP]
+
+MAX_FEEDS = 16
+
+MARGIN = 4 # Space between a tile's border and its frame
+LABEL_HEIGHT = 20 # Space under each frame for the camera name and frame counters
+ASPECT = 4 / 3 # Frame aspect ratio the grid shape is chosen for
+
+class Tile:
+	"""A feed's part of the screen: its whole rectangle, the rectangle frames are fitted into and the label below it"""
+	def __init__(self, rect):
+		self.rect = pygame.Rect(rect)
+		self.frame = pygame.Rect(
+			self.rect.left + MARGIN, self.rect.top + MARGIN,
+			max(1, self.rect.width - 2 * MARGIN), max(1, self.rect.height - 2 * MARGIN - LABEL_HEIGHT)
+		)
+		self.label = pygame.Rect(self.frame.left, self.frame.bottom, self.frame.width, LABEL_HEIGHT)
+
+	@property
+	def size(self):
+		"""Largest (width, height) frames are shown at, which is also the decode target"""
+		return self.frame.size
+
+class Layout:
+	"""
+	Tiles up to MAX_FEEDS camera feeds into an area of the screen, as a grid, the focused feed with a
+	strip of the others, or picture-in-picture.
+
+	The tiles are worked out whenever the mode, focus or area changes (`arrange`) and kept in a dict by
+	camera name, so placing a frame is a lookup rather than a search
+	"""
+	def __init__(self, names:"list[str]", area, mode=GRID, focus=None):
+		"""
+		Parameters
+		----------
+		names : list[str]
+			Camera names, in the order they are tiled
+		area : pygame.Rect
+			Part of the screen the feeds are shown in
+		mode : str
+			GRID, FOCUS or PIP
+		focus : str
+			Camera shown large in the FOCUS and PIP modes (default the first)
+		"""
+		if not 1 <= len(names) <= MAX_FEEDS:
+			raise ValueError(f"Can only lay out 1 to {MAX_FEEDS} feeds, not {len(names)}")
+
+		self.names = list(names)
+		self.area = pygame.Rect(area)
+		self.mode = mode
+		self.focus = focus or self.names[0]
+
+		self.tiles = {} # Camera name: Tile
+		self.order = [] # Camera names in the order they are drawn (later tiles can overlap earlier ones)
+		self.above = {} # Camera name: names of the tiles drawn over part of it
+
+		self.arrange()
+
+	def arrange(self):
+		"""Work out every feed's tile for the current mode, focus and area"""
+		if self.mode == GRID or len(self.names) == 1:
+			rects = self.grid(self.names, self.area)
+		elif self.mode == FOCUS:
+			rects = self.focus_strip()
+		else:
+			rects = self.picture_in_picture()
+
+		self.order = [name for name, _ in rects]
+		self.tiles = dict((name, Tile(rect)) for name, rect in rects)
+
+		# Tiles that overlap are redrawn on top when the one below them changes
+		self.above = dict(
+			(name, [other for other in self.order[i + 1:] if self.tiles[name].rect.colliderect(self.tiles[other].rect)])
+			for i, name in enumerate(self.order)
+		)
+
+	def set_mode(self, mode):
+		self.mode = mode
+		self.arrange()
+
+	def next_mode(self):
+		"""Switch to the next layout mode"""
+		self.set_mode(MODES[(MODES.index(self.mode) + 1) % len(MODES)])
+
+	def set_focus(self, name):
+		self.focus = name
+		self.arrange()
+
+	def next_focus(self):
+		"""Focus the next camera"""
+		self.set_focus(self.names[(self.names.index(self.focus) + 1) % len(self.names)])
+
+	def tile_at(self, pos):
+		"""Returns the name of the camera shown at a point on the screen, or None"""
+		for name in reversed(self.order):
+			if self.tiles[name].rect.collidepoint(pos):
+				return name
+		return None
+
+	@staticmethod
+	def grid(names, area) -> list:
+		"""
+		Returns (name, rect) for feeds tiled in rows across an area, with the number of columns that
+		shows the frames largest
+		"""
+		def frame_width(cols):
+			rows = math.ceil(len(names) / cols)
+			width = area.width / cols - 2 * MARGIN
+			height = area.height / rows - 2 * MARGIN - LABEL_HEIGHT
+			return min(width, height * ASPECT)
+
+		cols = max(range(1, len(names) + 1), key=frame_width)
+		rows = math.ceil(len(names) / cols)
+
+		rects = []
+		for i, name in enumerate(names):
+			row, col = divmod(i, cols)
+			# Edges are spread by integer division so the tiles exactly fill the area
+			left = area.left + area.width * col // cols
+			top = area.top + area.height * row // rows
+			right = area.left + area.width * (col + 1) // cols
+			bottom = area.top + area.height * (row + 1) // rows
+			rects.append((name, pygame.Rect(left, top, right - left, bottom - top)))
+		return rects
+
+	def focus_strip(self) -> list:
+		"""The focused feed above a strip of the others (a deeper strip when there are many)"""
+		others = [name for name in self.names if name != self.focus]
+		strip = self.area.height // 4 if len(others) <= 4 else self.area.height // 3
+
+		main = pygame.Rect(self.area.left, self.area.top, self.area.width, self.area.height - strip)
+		strip = pygame.Rect(self.area.left, main.bottom, self.area.width, strip)
+		return [(self.focus, main)] + self.grid(others, strip)
+
+	def picture_in_picture(self) -> list:
+		"""The focused feed filling the area, with the others in rows of up to 5 insets above its label"""
+		others = [name for name in self.names if name != self.focus]
+		main = Tile(self.area)
+
+		width = main.frame.width // 5
+		height = int((width - 2 * MARGIN) / ASPECT) + 2 * MARGIN + LABEL_HEIGHT
+
+		rects = [(self.focus, self.area)]
+		for i, name in enumerate(others):
+			row, col = divmod(i, 5)
+			rects.append((name, pygame.Rect(
+				main.frame.right - (col + 1) * width, main.frame.bottom - (row + 1) * height,
+				width, height
+			)))
+		return rects
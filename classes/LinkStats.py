@@ -0,0 +1,108 @@
+# Import libraries
+import time
+import threading
+import numpy as np
+from collections import deque
+
+class ClockSync:
+	"""
+	NTP-style estimate of the rover's clock offset and the round trip time of the control link.
+
+	Each ping/pong exchange gives four timestamps (ns): t0 laptop send, t1 rover receive, t2 rover
+	send and t3 laptop receive. Exchanges that were delayed (eg queued behind other traffic) give
+	poor offsets, so the estimate uses the exchange with the smallest RTT out of the recent ones.
+	"""
+	def __init__(self, window=16):
+		"""
+		Parameters
+		----------
+		window : int
+			Number of recent exchanges to choose the best estimate from
+		"""
+		self.samples = deque(maxlen=window)
+		self.offset = 0.0 # Rover clock minus laptop clock (seconds)
+		self.rtt = None # Latest round trip time (seconds)
+		self.synced = False
+
+	def add(self, t0, t1, t2, t3):
+		"""Add the timestamps of one ping/pong exchange"""
+		offset = ((t1 - t0) + (t2 - t3)) / 2e9
+		rtt = ((t3 - t0) - (t2 - t1)) / 1e9
+
+		self.samples.append((rtt, offset))
+		self.rtt = rtt
+		self.offset = min(self.samples)[1]
+		self.synced = True
+
+	def age(self, remote_time):
+		"""Seconds since `remote_time` (a `time.time()` value from the rover's clock)"""
+		return time.time() - (remote_time - self.offset)
+
+class LatencyHistogram:
+	"""Rolling window of latency samples for one channel, summarised as percentiles"""
+	def __init__(self, window=10.0):
+		"""
+		Parameters
+		----------
+		window : float
+			Seconds of samples to keep
+		"""
+		self.window = window
+		self.lock = threading.Lock()
+		self.samples = deque()
+
+	def add(self, value):
+		"""Add a latency sample (seconds)"""
+		now = time.monotonic()
+		with self.lock:
+			self.samples.append((now, value))
+			while self.samples[0][0] < now - self.window:
+				self.samples.popleft()
+
+	def percentiles(self, q=(50, 95, 99)):
+		"""Returns the requested percentiles (ms) over the window, or None if there are no samples"""
+		with self.lock:
+			values = [value for _, value in self.samples]
+
+		if not values:
+			return None
+		return tuple(np.percentile(values, q) * 1000)
+
+class LinkStats:
+	"""
+	Clock sync and per-channel latency histograms, shared by every socket.
+	Latencies are one-way ages: laptop receive time minus the rover's send time, corrected for the
+	clock offset
+	"""
+	def __init__(self, window=10.0):
+		self.clock = ClockSync()
+		self.window = window
+		self.channels = {}
+
+	def record(self, channel, remote_time):
+		"""
+		Record the age of a message and return it (seconds)
+
+		Parameters
+		----------
+		channel : str
+			Channel name (eg "feedback" or the camera name)
+		remote_time : float
+			`time.time()` on the rover when the message was sent
+		"""
+		age = self.clock.age(remote_time)
+
+		histogram = self.channels.get(channel)
+		if histogram is None:
+			histogram = self.channels[channel] = LatencyHistogram(self.window)
+		histogram.add(age)
+
+		return age
+
+	def summary(self) -> dict:
+		"""Returns the RTT, offset (ms) and the p50/p95/p99 age of each channel (ms)"""
+		return {
+			"rtt": None if self.clock.rtt is None else self.clock.rtt * 1000,
+			"offset": self.clock.offset * 1000,
+			"channels": dict((name, histogram.percentiles()) for name, histogram in list(self.channels.items()))
+		}
@@ -0,0 +1,155 @@
+# Import libraries
+import threading
+import numpy as np
+import pygame
+
+def douglas_peucker(points:np.ndarray, tolerance:float) -> np.ndarray:
+	"""
+	Returns the indices of the points kept when simplifying a polyline so that no removed point is
+	further than `tolerance` from the simplified line (Douglas-Peucker, with a stack rather than
+	recursion and each span's distances computed at once)
+
+	Parameters
+	----------
+	points : np.ndarray
+		(n, 2) polyline
+	tolerance : float
+		Most distance a removed point can be from the simplified line
+	"""
+	n = len(points)
+	if n < 3:
+		return np.arange(n)
+
+	keep = np.zeros(n, dtype=bool)
+	keep[0] = keep[-1] = True
+	stack = [(0, n - 1)]
+	while stack:
+		first, last = stack.pop()
+		if last - first < 2:
+			continue
+
+		# Distance of each point in the span from the line between its ends
+		start, end = points[first], points[last]
+		direction = end - start
+		length = np.hypot(*direction)
+		offsets = points[first + 1:last] - start
+		if length == 0:
+			distances = np.hypot(offsets[:, 0], offsets[:, 1])
+		else:
+			distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+
+		i = int(np.argmax(distances))
+		if distances[i] > tolerance:
+			i += first + 1
+			keep[i] = True
+			stack.append((first, i))
+			stack.append((i, last))
+
+	return np.flatnonzero(keep)
+
+class MapTrail:
+	"""
+	The rover's trail on the overhead map.
+
+	Positions are kept in a numpy array that doubles in size when full, so appending is O(1). The
+	trail is drawn onto a cached surface: each frame only the segments added since the last frame are
+	drawn, and the whole trail is only redrawn when the view (scale or shift) changes. A redraw
+	simplifies the trail first, snapping it to pixels and then with Douglas-Peucker to within half a
+	pixel, so its cost depends on the detail visible on the map rather than the number of positions.
+
+	Positions can be appended from another thread (eg as feedback arrives) while the trail is drawn:
+	rows are never changed once written, so drawing only needs the array and count at the same moment.
+	"""
+	def __init__(self, start=(0, 0), capacity=1024, colour=(255, 0, 0)):
+		"""
+		Parameters
+		----------
+		start : list[float]
+			First position
+		capacity : int
+			Positions to make room for at first
+		colour : list[int]
+			Trail colour
+		"""
+		self.lock = threading.Lock()
+		self.points = np.zeros((capacity, 2), dtype=np.float64)
+		self.points[0] = start
+		self.count = 1
+		self.colour = colour
+
+		self.surface = None
+		self.view = None # (size, centre, scale, shift) the surface was drawn for
+		self.drawn = 0 # Number of positions drawn onto the surface
+		self.redraws = 0
+
+	def append(self, point):
+		"""Add a position to the end of the trail"""
+		with self.lock:
+			if self.count == len(self.points):
+				points = np.zeros((2 * len(self.points), 2), dtype=np.float64)
+				points[:self.count] = self.points[:self.count]
+				self.points = points
+
+			self.points[self.count] = point
+			self.count += 1
+
+	def __len__(self):
+		return self.count
+
+	def to_pixels(self, points, centre, scale, shift):
+		"""Map positions to pixels on the trail surface"""
+		return np.asarray(centre) + (points - np.asarray(shift)) * scale
+
+	def render(self, size, centre, scale, shift=(0, 0)) -> pygame.Surface:
+		"""
+		Returns the trail drawn on a surface, updated with any new positions
+
+		Parameters
+		----------
+		size : list[int]
+			Surface (width, height)
+		centre : list[float]
+			Pixel the origin (less `shift`) is drawn at
+		scale : float
+			Pixels per unit of position
+		shift : list[float]
+			Position drawn at the centre
+		"""
+		with self.lock:
+			points = self.points[:self.count]
+
+		view = (tuple(size), tuple(centre), scale, tuple(shift))
+		if view != self.view:
+			self.redraw(view, points)
+
+		elif self.drawn < len(points):
+			# Only the segments since the last frame, joined to the last position drawn
+			pixels = self.to_pixels(points[self.drawn - 1:], centre, scale, shift)
+			pygame.draw.lines(self.surface, self.colour, False, pixels)
+			self.drawn = len(points)
+
+		return self.surface
+
+	def redraw(self, view, points):
+		"""Draw the whole trail (simplified) on a new surface"""
+		size, centre, scale, shift = view
+		self.view = view
+		self.redraws += 1
+
+		if self.surface is None or self.surface.get_size() != size:
+			self.surface = pygame.Surface(size)
+		self.surface.fill((0, 0, 0))
+
+		pixels = self.to_pixels(points, centre, scale, shift)
+
+		# Consecutive positions in the same pixel draw nothing, then drop points within half a pixel of the line
+		snapped = np.round(pixels)
+		moved = np.ones(len(snapped), dtype=bool)
+		moved[1:] = np.any(snapped[1:] != snapped[:-1], axis=1)
+		moved[-1] = True
+		pixels = pixels[moved]
+		pixels = pixels[douglas_peucker(pixels, 0.5)]
+
+		if len(pixels) > 1:
+			pygame.draw.lines(self.surface, self.colour, False, pixels)
+		self.drawn = len(points)
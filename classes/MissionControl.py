@@ -4,8 +4,20 @@ import pygame
 import time
 import cv2
 
+# Import classes
+from classes.Layout import Layout, GRID, FOCUS
+from classes.MapTrail import MapTrail
+from classes.TextCache import TextCache
+from classes.ButtonGrid import ButtonGrid
+
 WHITE = (255, 255, 255) # We use white a lot so we define it seperately
 
+# Shape of the grid of on screen action buttons
+ACTION_ROWS, ACTION_COLS = 4, 4
+
+FPS = 30 # Most frames drawn per second
+INPUT_POLL = 0.01 # Most time (seconds) between event pumps while waiting for the next frame
+
 class MissionControl():
 	'''Class for managing the pygame window'''
 	
@@ -16,13 +28,29 @@ class MissionControl():
 		self.HEIGHT = HEIGHT
 		self.screen = pygame.display.set_mode((self.WIDTH, self.HEIGHT))
 		pygame.display.set_caption("TBRo Mission Control")
-		self.clock = pygame.time.Clock()
-		self.CAMS = dict([(name, i) for i, name in enumerate(CAM_NAMES)])
+		self.next_frame = time.perf_counter() # When the next frame is due
+		self.text = TextCache() # Fonts and rendered text, shared by everything drawn
+
+		self.vu = self.HEIGHT // 6 # Vertical unit (also set in draw_borders)
+		self.div = self.WIDTH - 4 * self.vu
+
+		# Parts of the screen changed since the display was last updated, and the inputs each panel was last
+		# drawn with (panels are only redrawn when these change)
+		self.dirty = []
+		self.panels = {}
+		self.full_update = True # Update the whole display (eg the first frame)
+
+		# Camera feeds are tiled left of the panels
+		self.layout = Layout(CAM_NAMES, (0, 0, self.div, self.HEIGHT))
+		self.feeds = {} # Camera name: (surface of the last frame drawn, its frame counters), to redraw it without decoding again
+		self.buffers = {} # Camera name: the buffer its frames are scaled into
+		self.surfaces = {} # Camera name: surface showing its buffer (kept until the tile or frame size changes)
+		self.redraw_feeds()
 
 		self.map_info = {
 			"current": np.array([0, 0]),
 			"heading": 0,
-			"trail": [np.array([0, 0])],
+			"trail": MapTrail((0, 0)),
 			"shift": np.array([0, 0]),
 			"zoom": 1
 		}
@@ -32,7 +60,8 @@ class MissionControl():
 			"elevation": 0,
 			"pitch": 0, # All in radians
 			"roll": 0,
-			"heading": 0
+			"heading": 0,
+			"store": {"overwrites": 0, "drops": 0}
 		}
 		self.system_info = {
 			"timeractive": False,
@@ -40,12 +69,15 @@ class MissionControl():
 			"battery": 100,
 			"voltage": 10,
 			"current": 10,
-			"conn": False
+			"conn": "down",
+			"control": {"rate": 0, "p99": 0},
+			"link": {"rtt": None, "offset": 0, "channels": {}},
+			"stream": {"budget": 0, "throughput": 0, "congested": False}
 		}
+		self.buttons = ButtonGrid(ACTION_ROWS, ACTION_COLS, self.text)
 		self.actions_info = {
-			"state": [0] * 16,
-			"labels": [""] * 16,
-			"bboxes": [[0,0,0,0]] * 16
+			"state": [0] * len(self.buttons),
+			"labels": [""] * len(self.buttons)
 		}
 
 	def get_width_vu(self):
@@ -53,11 +85,63 @@ class MissionControl():
 		return self.WIDTH, self.vu
 
 	def update_display(self):
-		"""Runs the `pygame.display.flip()` function to show the update to the pygame window"""
-		pygame.display.flip()
-		self.clock.tick(30)
+		"""Shows the parts of the screen that changed since the last update in the pygame window"""
+		self.pump_input()
+		if self.full_update:
+			pygame.display.flip()
+			self.full_update = False
+		elif self.dirty:
+			pygame.display.update(self.dirty)
+		self.dirty = []
+		self.wait_frame()
+
+	def pump_input(self):
+		"""
+		Let SDL process pending input. The joystick state that the control thread samples is only updated
+		when the main thread pumps events, so this is called between the expensive parts of a frame. Events
+		stay queued for the next `pygame.event.get()`
+		"""
+		pygame.event.pump()
+
+	def wait_frame(self):
+		"""Wait until the next frame is due, pumping input every INPUT_POLL rather than sleeping through it"""
+		while True:
+			self.pump_input()
+			remaining = self.next_frame - time.perf_counter()
+			if remaining <= 0:
+				break
+			time.sleep(min(INPUT_POLL, remaining))
+
+		# A frame that overran starts the next one from now rather than rushing to catch up
+		self.next_frame = max(self.next_frame + 1 / FPS, time.perf_counter())
+
+	def invalidate(self):
+		"""Redraw everything on the next frame (eg after the window was covered)"""
+		self.panels = {}
+		self.full_update = True
+		self.redraw_feeds()
+
+	def changed(self, panel, rect, key) -> bool:
+		"""
+		Whether a panel's inputs differ from when it was last drawn. If they do, its area is marked to
+		be updated on the display
 
-	def write_text(self, s, coords, size=16, col=(255, 255, 255)):
+		Parameters
+		----------
+		panel : str
+			Panel name
+		rect : pygame.Rect
+			Area of the screen the panel draws in
+		key : tuple
+			Everything the panel's drawing depends on
+		"""
+		if self.panels.get(panel) == key:
+			return False
+		self.panels[panel] = key
+		self.dirty.append(pygame.Rect(rect))
+		return True
+
+	def write_text(self, s, coords, size=16, col=(255, 255, 255), cache=True):
 		"""
 		Function for writing text directly onto the pygame screen
 
@@ -71,8 +155,10 @@ class MissionControl():
 			Font size
 		col : list[int]
 			Font colour
+		cache : bool
+			Keep the rendered text in the text cache (False for values that change every frame)
 		"""
-		text = pygame.font.SysFont("monospace", size).render(f"{s}", True, col)
+		text = self.text.render(f"{s}", size, col, cache=cache)
 		self.screen.blit(text, coords)
 
 	def draw_line(self, start, end, colour=WHITE):
@@ -83,12 +169,13 @@ class MissionControl():
 		self.vu = self.HEIGHT // 6 # Vertical unit (building block for organising the screen)
 		self.div = self.WIDTH - 4 * self.vu # Vertical self.dividing line (value is used a lot)
 
-		self.draw_line((self.div, 10), (self.div, self.HEIGHT - 10))
-		self.draw_line((10, self.HEIGHT // 2), (self.div, self.HEIGHT // 2))
+		# The borders don't change, so are only drawn with the rest of the screen
+		if self.changed("borders", (self.div, 0, self.WIDTH - self.div, self.HEIGHT), (self.WIDTH, self.HEIGHT)):
+			self.draw_line((self.div, 10), (self.div, self.HEIGHT - 10))
 
-		self.draw_line((self.div, 2 * self.vu), (self.WIDTH - 10, 2 * self.vu))
-		self.draw_line((self.div, 4 * self.vu), (self.div + 2 * self.vu, 4 * self.vu))
-		self.draw_line((self.div + 2 * self.vu, 10), (self.div + 2 * self.vu, self.HEIGHT - 10))
+			self.draw_line((self.div, 2 * self.vu), (self.WIDTH - 10, 2 * self.vu))
+			self.draw_line((self.div, 4 * self.vu), (self.div + 2 * self.vu, 4 * self.vu))
+			self.draw_line((self.div + 2 * self.vu, 10), (self.div + 2 * self.vu, self.HEIGHT - 10))
 
 
 		# [Temp]
@@ -103,36 +190,30 @@ class MissionControl():
 		sf = 2 * self.vu # Scale factor
 		centre = np.array([sf // 2, sf]) # Relative centre
 
-		# Fill background
-		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, 2 * sf-2])
-
-		# Draw trail
-		for i in range(len(self.map_info["trail"]) - 1):
-			current = self.map_info["trail"][::-1][i]
-			next = self.map_info["trail"][::-1][i+1]
+		scale = sf / 100 * self.map_info["zoom"] # Pixels per unit of position
+		shift = self.map_info["shift"]
 
-			# Opacity
-			# if i < 10:
-			# 	colour = (255, 0, 0, 1 - 0.7 * i/9)
-			# else:
-			# 	colour = (255, 0, 0, 0.3)
+		area = pygame.Rect(pos[0] + 1, pos[1] + 1, sf - 2, 2 * sf - 2)
+		key = (tuple(area), len(self.map_info["trail"]), tuple(self.map_info["current"]), scale, tuple(shift))
+		if not self.changed("overhead_map", area, key):
+			return
+		self.screen.set_clip(area)
 
-			self.draw_line(
-				pos + centre + current * sf / 100 * self.map_info["zoom"],
-				pos + centre + next * sf / 100 * self.map_info["zoom"],
-				(255, 0, 0)
-			)
+		# Trail (cached, with only new positions drawn each frame), which also fills the background
+		trail = self.map_info["trail"].render((sf - 2, 2 * sf - 2), centre - 1, scale, shift)
+		self.screen.blit(trail, pos + 1)
 
 		# Current position
 		pygame.draw.circle(
 			self.screen, (255, 0, 0), 
-			pos + centre + self.map_info["current"] * sf / 100 * self.map_info["zoom"], 
+			pos + centre + (self.map_info["current"] - shift) * scale, 
 			2 * sf / 100
 		)
 
 		# Centre cross
 		self.draw_line(pos + centre + np.array([-5, -5]), pos + centre + np.array([5, 5]))
 		self.draw_line(pos + centre + np.array([-5, 5]), pos + centre + np.array([5, -5]))
+		self.screen.set_clip(None)
 
 	def scoop_status(self, pos):
 		sf = 2 * self.vu # Scale factor
@@ -145,6 +226,9 @@ class MissionControl():
 			[0, 0], [20, 30], [50, 30]
 		]) * sf / 100
 
+		if not self.changed("scoop_status", (pos[0], pos[1], sf, sf), (tuple(pos), repr(self.scoop_info))):
+			return
+
 		# Fill background
 		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, sf-2])
 
@@ -155,11 +239,14 @@ class MissionControl():
 	def telemetry(self, pos):
 		sf = 2 * self.vu
 
+		if not self.changed("telemetry", (pos[0], pos[1], sf, sf), (tuple(pos), repr(self.telemetry_info))):
+			return
+
 		# Fill background
 		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, sf-2])
 	
 		# Speed and elevation
-		self.write_text(f"Speed: {self.telemetry_info['speed']:3} | Elev: {self.telemetry_info['elevation']:2}", pos + np.array([4, 4]) * sf / 100, int(7 * sf / 100))
+		self.write_text(f"Speed: {self.telemetry_info['speed']:3} | Elev: {self.telemetry_info['elevation']:2}", pos + np.array([4, 4]) * sf / 100, int(7 * sf / 100), cache=False)
 
 		# Orientation
 		radius = 25 * sf / 100
@@ -180,12 +267,13 @@ class MissionControl():
 			[50 + 35 * np.sin(self.telemetry_info["roll"]), 55 + 35 * np.cos(self.telemetry_info["roll"])]
 		) * sf / 100, radius // 6)
 
+		# Telemetry store pressure (values overwritten and events dropped before they were drawn)
+		store = self.telemetry_info["store"]
+		self.write_text(f"Overwr: {store['overwrites']} | Drop: {store['drops']}", pos + np.array([4, 92]) * sf / 100, int(6 * sf / 100), cache=False)
+
 	def system(self, pos):
 		sf = 2 * self.vu
 
-		# Fill background
-		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, sf-2])
-
 		# Clock
 		if self.system_info["timeractive"]:
 			m, s = divmod(self.system_info["timerend"] - time.time(), 60)
@@ -195,96 +283,208 @@ class MissionControl():
 				m, s = 0, 0
 		else:
 			m, s = 0, 0
-		self.write_text(f"{m:0>{2}}:{s:0>{2}}", pos + np.array([8, 4]) * sf / 100, int(26 * sf / 100))
+		clock = f"{m:0>{2}}:{s:0>{2}}"
 
 		# Battery
-		self.write_text(f"  Speed: {self.system_info['battery']:3}%", pos + np.array([6, 22 + 8]) * sf / 100, int(7 * sf / 100))
-		self.write_text(f"Voltage: {self.system_info['voltage']:3}V", pos + np.array([6, 22 + 2 * 8]) * sf / 100, int(7 * sf / 100))
-		self.write_text(f"Current: {self.system_info['current']:3}A", pos + np.array([6, 22 + 3 * 8]) * sf / 100, int(7 * sf / 100))
-		self.write_text(f"Connected: {self.system_info['conn']}", pos + np.array([6, 22 + 5 * 8]) * sf / 100, int(7 * sf / 100))
+		lines = [
+			f"  Speed: {self.system_info['battery']:3}%",
+			f"Voltage: {self.system_info['voltage']:3}V",
+			f"Current: {self.system_info['current']:3}A"
+		]
+
+		# Camera bandwidth against the quality controller's budget (kB/s)
+		stream = self.system_info["stream"]
+		congested = " !" if stream["congested"] else ""
+		lines.append(f"Stream: {stream['throughput']:.0f}/{stream['budget']:.0f}kB/s{congested}")
+		lines.append(f"Link: {self.system_info['conn']}")
+
+		# Control scheduler rate and jitter
+		control = self.system_info["control"]
+		lines.append(f"Control: {control['rate']:3.0f}Hz p99 {control['p99']:.1f}ms")
+
+		# Link latency (message ages are p50/p95/p99 in ms)
+		link = self.system_info["link"]
+		rtt = "--" if link["rtt"] is None else f"{link['rtt']:.1f}"
+		lines.append(f"RTT: {rtt}ms Off: {link['offset']:+.1f}ms")
+
+		for name, ages in list(link["channels"].items())[:2]:
+			ages = "--" if ages is None else "/".join(f"{age:.0f}" for age in ages)
+			lines.append(f"{name[:8]}: {ages}ms")
+
+		# Only redrawn when the text shown changes
+		if not self.changed("system", (pos[0], pos[1], sf, sf), (tuple(pos), clock, tuple(lines))):
+			return
+
+		# Fill background
+		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, sf-2])
+
+		self.write_text(clock, pos + np.array([8, 4]) * sf / 100, int(26 * sf / 100), cache=False)
+		for i, line in enumerate(lines):
+			self.write_text(line, pos + np.array([6, 22 + (i + 1) * 8]) * sf / 100, int(7 * sf / 100), cache=False)
 
 	def actions(self, pos):
 		sf = 2 * self.vu
 
-		# Fill background
-		pygame.draw.rect(self.screen, (0, 0, 0), [pos[0]+1, pos[1]+1, sf-2, sf-2])
+		key = (tuple(pos), tuple(self.actions_info["labels"]), tuple(self.actions_info["state"]))
+		if not self.changed("actions", (pos[0], pos[1], sf, sf), key):
+			return
 
-		# Button size
-		size = 20 * sf / 100
-
-		# Draw buttons with labels
-		for i in range(4):
-			for j in range(4):
-				index = 4 * j + i
-
-				border = pygame.Rect(
-					pos[0] + 15 + (size + 5) * i, 
-					pos[1] + 10 + (size + 5) * j, 
-					size, size
-				)
-				pygame.draw.rect(self.screen, WHITE, border, 1)
-
-				font = pygame.font.SysFont("monospace", 16)
-				text = font.render(self.actions_info["labels"][index], True, (255, 255, 255))
-				text_rect = text.get_rect()
-				text_rect.center = border.center
-				self.screen.blit(text, text_rect)
-
-				self.actions_info["bboxes"][index] = [pos[0] + 15 + (size + 5) * i, pos[1] + 10 + (size + 5) * j] * 2
-				self.actions_info["bboxes"][index][2] += size
-				self.actions_info["bboxes"][index][3] += size
-
-	def prepare_frame(self, frame:np.ndarray, des_dim:"tuple[int]"):
-		"""Transform and scale the frame to the desired dimensions"""
-		# Invert, rotate and correctly colour (by checking if frame has 2 dimensions)
-		if frame.ndim == 2:
-			frame = cv2.cvtColor(np.rot90(np.fliplr(frame)), cv2.COLOR_GRAY2RGB) # GRAYSCALE
-		else:
-			frame = cv2.cvtColor(np.rot90(np.fliplr(frame)), cv2.COLOR_BGR2RGB) # RGB
+		# Buttons are drawn on a cached surface, which is only redrawn when the labels or states change
+		area = pygame.Rect(pos[0] + 1, pos[1] + 1, sf - 2, sf - 2)
+		if area != self.buttons.rect:
+			self.buttons.place(area)
+		self.screen.blit(self.buttons.render(self.actions_info["labels"], self.actions_info["state"]), area)
 
+	def prepare_frame(self, frame:np.ndarray, des_dim:"tuple[int]", out:np.ndarray=None) -> np.ndarray:
+		"""
+		Scale a frame to fit within the desired (width, height), in one pass into `out` if it is the
+		right size (otherwise a new buffer is returned, to pass in next time). The result is BGR, in
+		rows like the frame, which is how `pygame.image.frombuffer` reads it (so it doesn't need to be
+		rotated into pygame's (width, height) order or converted to RGB)
+
+		Parameters
+		----------
+		frame : np.ndarray
+			Decoded BGR or grayscale frame
+		des_dim : tuple[int]
+			Largest (width, height) to show the frame at
+		out : np.ndarray
+			Buffer from the last frame of this feed
+		"""
 		# Calculate the required scale factor
-		cur_dim = frame.shape
 		sf = min([
-			(des_dim[0] - 16) / cur_dim[0],
-			(des_dim[1] - 38) / cur_dim[1]
+			des_dim[0] / frame.shape[1],
+			des_dim[1] / frame.shape[0]
 		])
+		size = (max(1, int(frame.shape[1] * sf)), max(1, int(frame.shape[0] * sf)))
 
-		# Scale frame
-		frame = cv2.resize(frame, (
-			int(frame.shape[1] * sf), 
-			int(frame.shape[0] * sf)
-		))
-
-		# Return the prepared frame
-		return frame
-
-	def draw_images(self, name, img):
-		i = self.CAMS[name]
-		
-		bounding_box = pygame.Rect(
-				0, i * self.HEIGHT // 2, 
-				self.WIDTH - 4 * self.vu, 
-				self.HEIGHT // 2
-		)
+		if out is None or out.shape != (size[1], size[0], 3):
+			out = np.empty((size[1], size[0], 3), dtype=np.uint8)
 
-		# If frame is available, display it
+		# Scale frame (grayscale frames are scaled first, so only the small frame is expanded to colour)
+		if frame.ndim == 2:
+			cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_GRAY2BGR, dst=out)
+		else:
+			cv2.resize(frame, size, dst=out)
+
+		return out
+
+	def frame_size(self, name):
+		"""Returns the largest (width, height) a camera's frames are displayed at"""
+		return self.layout.tiles[name].size
+
+	def draw_images(self, name, img, stats=None):
+		"""
+		Draw a camera frame in its tile
+
+		Parameters
+		----------
+		name : str
+			Camera name
+		img : np.ndarray
+			Decoded frame (anything else shows the feed as unavailable)
+		stats : dict
+			Received, displayed and dropped frame counts for the camera (from `FrameSlot.stats`)
+		"""
 		if type(img) == np.ndarray:
-			dim = (self.WIDTH - 2 * self.vu, self.HEIGHT // 2)
-			prepared_frame = self.prepare_frame(img, dim)
-			surf = pygame.surfarray.make_surface(prepared_frame)
+			# Frames are scaled into the feed's buffer, which its surface reads directly, so drawing a
+			# frame updates the surface in place
+			self.set_buffer(name, self.prepare_frame(img, self.frame_size(name), self.buffers.get(name)))
+			surf = self.surfaces[name]
+		else:
+			surf = None
+		self.feeds[name] = (surf, stats)
+
+		self.blit_feed(name)
+
+		# Redraw any tiles this one overlaps (picture-in-picture insets)
+		for other in self.layout.above[name]:
+			if other in self.feeds:
+				self.blit_feed(other)
+
+	def set_buffer(self, name, buffer):
+		"""Make a new surface for a feed if its buffer was reallocated (the tile or frame size changed)"""
+		if buffer is not self.buffers.get(name):
+			self.buffers[name] = buffer
+			self.surfaces[name] = pygame.image.frombuffer(buffer, (buffer.shape[1], buffer.shape[0]), "BGR")
+
+	def blit_feed(self, name):
+		"""Draw a camera's last frame, border and label in its tile"""
+		tile = self.layout.tiles[name]
+		surf, stats = self.feeds[name]
+
+		pygame.draw.rect(self.screen, WHITE, tile.rect, 1)
+		self.dirty.append(tile.rect)
+
+		if surf is not None:
 			surf_rect = surf.get_rect()
-			surf_rect.center = bounding_box.center
+			surf_rect.center = tile.frame.center
 			self.screen.blit(surf, surf_rect)
-			
 		else:
-			# Otherwise, say that is isn't
-			font = pygame.font.SysFont("monospace", 16)
-			text = font.render("[Feed unavailable]", True, (255, 255, 255))
+			# Say that the feed isn't available
+			self.screen.fill((0, 0, 0), tile.frame)
+			text = self.text.render("[Feed unavailable]", 16)
 			text_rect = text.get_rect()
-			text_rect.center = bounding_box.center
+			text_rect.center = tile.frame.center
 			self.screen.blit(text, text_rect)
 
+		# Name and frame counters under the frame, shortened to fit small tiles (about 8px a character).
+		# Only the name is cached, as the counters change every frame
+		self.screen.fill((0, 0, 0), tile.label)
+		counters = ""
+		if stats is not None:
+			for text in [
+				f" | rx {stats['received']} | shown {stats['displayed']} | drop {stats['dropped']}",
+				f" | drop {stats['dropped']}"
+			]:
+				if (len(name) + len(text)) * 8 <= tile.label.width:
+					counters = text
+					break
+
+		text = self.text.render(name[:tile.label.width // 8], 14)
+		self.screen.blit(text, (tile.label.left + 4, tile.label.top + 2))
+		if counters:
+			self.write_text(counters, (tile.label.left + 4 + text.get_width(), tile.label.top + 2), 14, cache=False)
+
+	def redraw_feeds(self):
+		"""Clear the feed area and draw every tile again (after the layout changes)"""
+		self.screen.fill((0, 0, 0), self.layout.area)
+		self.dirty.append(self.layout.area)
+		for name in self.layout.order:
+			if name in self.feeds:
+				# Rescale the last frame into a buffer for its new tile until the next one (decoded for the new size) arrives
+				surf, stats = self.feeds[name]
+				if surf is not None:
+					self.set_buffer(name, self.prepare_frame(self.buffers[name], self.frame_size(name)))
+					self.feeds[name] = (self.surfaces[name], stats)
+				self.blit_feed(name)
+			else:
+				pygame.draw.rect(self.screen, WHITE, self.layout.tiles[name].rect, 1)
+
+	def next_layout(self):
+		"""Switch the feeds to the next layout mode"""
+		self.layout.next_mode()
+		self.redraw_feeds()
+
+	def focus_feed(self, name=None):
+		"""
+		Show a camera large (the next camera if `name` is None), switching from the grid to the focus layout
+
+		Parameters
+		----------
+		name : str
+			Camera to focus
+		"""
+		if name is None:
+			self.layout.next_focus()
+		else:
+			self.layout.set_focus(name)
+		if self.layout.mode == GRID:
+			self.layout.set_mode(FOCUS)
+		self.redraw_feeds()
+
 	def write_coords(self):
 		"""[Temp] Writes current coords of mouse to screen"""
 		self.screen.fill((0, 0, 0), (0, 0, 150, 20))
-		self.write_text(pygame.mouse.get_pos(), (0, 0))
+		self.write_text(pygame.mouse.get_pos(), (0, 0), cache=False)
+		self.dirty.append(pygame.Rect(0, 0, 150, 20))
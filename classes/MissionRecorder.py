@@ -0,0 +1,334 @@
+# Import libraries
+import os
+import json
+import mmap
+import time
+import queue
+import struct
+import bisect
+import threading
+import numpy as np
+from collections import namedtuple
+
+# Record kinds
+FRAME = 0
+FEEDBACK = 1
+
+# Record header: receive time, kind, rover time (NaN if unknown), name length and payload length
+RECORD = struct.Struct("<dBdHI")
+
+# Index entry for each record: receive time and offset of the record in its segment
+INDEX = np.dtype([("time", "<f8"), ("offset", "<u8")])
+
+# Most seconds `close` waits for the queued records to be written
+CLOSE_TIMEOUT = 5.0
+
+Record = namedtuple("Record", ["time", "kind", "remote_time", "name", "payload"])
+
+def segment_paths(path, number):
+	"""Data and index file paths of a segment"""
+	return os.path.join(path, f"{number:05d}.rec"), os.path.join(path, f"{number:05d}.idx")
+
+class MissionRecorder:
+	"""
+	Records the camera frames and feedback received during a run, as they arrived (the JPEG bytes
+	aren't decoded or re-encoded), each with the time it was received.
+
+	Recordings are a directory of segments, each an append-only data file of records and an index of
+	(receive time, offset) pairs. A new segment is started when the current one reaches `segment_size`.
+
+	The receive side only puts records on a bounded queue, which a background thread writes out. If
+	the queue is full (the disk can't keep up) the record is dropped and counted, so recording never
+	stalls the network loop. If writing fails (eg the disk is full) recording stops: the error is
+	printed once and every later record is dropped.
+	"""
+	def __init__(self, path, segment_size=256 * 2**20, capacity=256, flush_interval=0.5):
+		"""
+		Parameters
+		----------
+		path : str
+			Directory to record into (created if it doesn't exist)
+		segment_size : int
+			Bytes of records in a segment before a new one is started
+		capacity : int
+			Most records waiting to be written
+		flush_interval : float
+			Most seconds written records are buffered before being flushed to the files
+		"""
+		self.path = path
+		self.segment_size = segment_size
+		self.flush_interval = flush_interval
+		os.makedirs(path, exist_ok=True)
+
+		self.queue = queue.Queue(capacity)
+		self.recorded = 0
+		self.dropped = 0
+		self.written = 0 # Bytes
+		self.error = None # Error that stopped recording
+		self.stopping = threading.Event()
+
+		self.segment = -1
+		self.data = None
+		self.index = None
+		self.offset = 0
+		self.last_time = 0.0
+
+		self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+		self.thread.start()
+
+	def record(self, kind, name, payload, remote_time=None):
+		"""
+		Queue a record to be written (from any thread). Returns False if it was dropped
+
+		Parameters
+		----------
+		kind : int
+			FRAME or FEEDBACK
+		name : str
+			Camera name or channel
+		payload : bytes-like
+			Record contents. Must not be changed after being recorded (eg a ZMQ frame, or a copy
+			of a receive buffer)
+		remote_time : float
+			The rover's `time.time()` when it sent the message, if known
+		"""
+		if self.error is not None:
+			self.dropped += 1
+			return False
+
+		try:
+			self.queue.put_nowait((time.time(), kind, remote_time, name, payload))
+			self.recorded += 1
+			return True
+		except queue.Full:
+			self.dropped += 1
+			return False
+
+	def record_frame(self, name, jpg_buffer, remote_time=None):
+		"""Queue a camera frame (JPEG bytes as received) to be written"""
+		return self.record(FRAME, name, jpg_buffer, remote_time)
+
+	def record_feedback(self, encoded_feedback, remote_time=None):
+		"""Queue a feedback message (JSON bytes as received) to be written"""
+		return self.record(FEEDBACK, "feedback", encoded_feedback, remote_time)
+
+	def close(self):
+		"""Write out the queued records and close the files, waiting at most about 2 * CLOSE_TIMEOUT"""
+		self.stopping.set()
+		try:
+			self.queue.put(None, timeout=CLOSE_TIMEOUT)
+		except queue.Full:
+			pass # The writer has fallen behind, and will stop once the queue is empty
+		self.thread.join(CLOSE_TIMEOUT)
+
+	def run(self):
+		"""Write records until closed, flushing at least every `flush_interval`"""
+		item = None
+		try:
+			self.next_segment()
+			last_flush = time.monotonic()
+
+			while True:
+				try:
+					item = self.queue.get(timeout=self.flush_interval)
+				except queue.Empty:
+					if self.stopping.is_set():
+						item = None
+					else:
+						item = False
+
+				if item:
+					self.write(*item)
+					item = False # Written
+
+				if item is None or time.monotonic() - last_flush > self.flush_interval:
+					# Data first, so the index rarely points past the data (the reader skips any entries that do)
+					self.data.flush()
+					self.index.flush()
+					last_flush = time.monotonic()
+
+				if item is None:
+					break
+
+		except OSError as e:
+			self.error = e
+			print(f"Recording stopped: {e}")
+			if item:
+				# The record being written when it failed
+				self.recorded -= 1
+				self.dropped += 1
+			self.discard()
+
+		finally:
+			for f in (self.data, self.index):
+				if f is not None:
+					try:
+						f.close()
+					except OSError:
+						pass
+
+	def discard(self):
+		"""After a write error, empty the queue (counting the records as dropped) until closed"""
+		while True:
+			try:
+				item = self.queue.get(timeout=self.flush_interval)
+			except queue.Empty:
+				if self.stopping.is_set():
+					return
+				continue
+
+			if item is None:
+				return
+			self.recorded -= 1
+			self.dropped += 1
+
+	def write(self, receive_time, kind, remote_time, name, payload):
+		if self.offset >= self.segment_size:
+			self.next_segment()
+
+		# Times can't go backwards (eg a clock adjustment), so the index stays sorted for seeking
+		receive_time = max(receive_time, self.last_time)
+		self.last_time = receive_time
+
+		name = name.encode()
+		payload = memoryview(payload)
+		header = RECORD.pack(receive_time, kind, np.nan if remote_time is None else remote_time, len(name), payload.nbytes)
+
+		self.data.write(header)
+		self.data.write(name)
+		self.data.write(payload)
+		self.index.write(struct.pack("<dQ", receive_time, self.offset))
+
+		size = RECORD.size + len(name) + payload.nbytes
+		self.offset += size
+		self.written += size
+
+	def next_segment(self):
+		"""Close the current segment and start a new one"""
+		if self.data is not None:
+			self.data.close()
+			self.index.close()
+
+		self.segment += 1
+		data_path, index_path = segment_paths(self.path, self.segment)
+		self.data = open(data_path, "wb")
+		self.index = open(index_path, "wb")
+		self.offset = 0
+
+	def stats(self) -> dict:
+		return {
+			"recorded": self.recorded,
+			"dropped": self.dropped,
+			"written": self.written,
+			"error": None if self.error is None else str(self.error)
+		}
+
+class MissionReader:
+	"""
+	Reads a recording made by `MissionRecorder`. Segments and their indexes are memory mapped, so
+	opening a long recording is quick, and seeking to a time is a binary search over the segments and
+	then the segment's index
+	"""
+	def __init__(self, path):
+		"""
+		Parameters
+		----------
+		path : str
+			Recording directory
+		"""
+		self.path = path
+		self.segments = [] # (data mmap, index array) of each non-empty segment
+
+		number = 0
+		while os.path.exists(segment_paths(path, number)[0]):
+			data_path, index_path = segment_paths(path, number)
+			number += 1
+
+			# Whole index entries only (the last may be partly written), and np.memmap can't map empty files
+			count = os.path.getsize(index_path) // INDEX.itemsize
+			if count == 0 or os.path.getsize(data_path) == 0:
+				continue
+			index = np.memmap(index_path, dtype=INDEX, mode="r", shape=(count,))
+
+			with open(data_path, "rb") as f:
+				data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+			# Drop index entries for records that weren't completely written (eg after a crash)
+			while len(index) and not self.complete(data, int(index[-1]["offset"])):
+				index = index[:-1]
+
+			if len(index):
+				self.segments.append((data, index))
+
+		# First time in each segment
+		self.starts = [float(index[0]["time"]) for _, index in self.segments]
+
+	@staticmethod
+	def complete(data, offset):
+		"""Whether a record is entirely within the data"""
+		if offset + RECORD.size > len(data):
+			return False
+		_, _, _, name_size, payload_size = RECORD.unpack_from(data, offset)
+		return offset + RECORD.size + name_size + payload_size <= len(data)
+
+	def __len__(self):
+		return sum(len(index) for _, index in self.segments)
+
+	@property
+	def start(self):
+		"""Receive time of the first record"""
+		return self.starts[0] if self.segments else None
+
+	@property
+	def end(self):
+		"""Receive time of the last record"""
+		return float(self.segments[-1][1][-1]["time"]) if self.segments else None
+
+	def seek(self, t) -> "tuple[int]":
+		"""Returns the position (segment, record) of the first record received at or after time `t`"""
+		segment = max(0, bisect.bisect_right(self.starts, t) - 1)
+		if segment >= len(self.segments):
+			return segment, 0
+
+		index = self.segments[segment][1]
+		i = int(np.searchsorted(index["time"], t, side="left"))
+		if i == len(index):
+			return segment + 1, 0
+		return segment, i
+
+	def read(self, position) -> Record:
+		"""Returns the record at a position. The payload is a memoryview into the recording"""
+		segment, i = position
+		data, index = self.segments[segment]
+		offset = int(index[i]["offset"])
+
+		receive_time, kind, remote_time, name_size, payload_size = RECORD.unpack_from(data, offset)
+		offset += RECORD.size
+		name = str(data[offset:offset + name_size], "utf-8")
+		offset += name_size
+		payload = memoryview(data)[offset:offset + payload_size]
+
+		return Record(receive_time, kind, None if np.isnan(remote_time) else remote_time, name, payload)
+
+	def records(self, start=None, end=None):
+		"""Yields the records received from time `start` (default the beginning) until `end`"""
+		segment, i = (0, 0) if start is None else self.seek(start)
+
+		while segment < len(self.segments):
+			index = self.segments[segment][1]
+			while i < len(index):
+				if end is not None and index[i]["time"] > end:
+					return
+				yield self.read((segment, i))
+				i += 1
+			segment, i = segment + 1, 0
+
+	@staticmethod
+	def feedback(record) -> dict:
+		"""Decode a FEEDBACK record's JSON"""
+		return json.loads(str(record.payload, "utf-8"))
+
+	def close(self):
+		for data, _ in self.segments:
+			data.close()
+		self.segments = []
@@ -0,0 +1,61 @@
+# Import libraries
+import asyncio
+import threading
+import traceback
+
+class NetworkLoop:
+	"""
+	Runs a single asyncio event loop in one background thread, shared by every network channel.
+
+	A channel is any object with an async `run` method, a `stop` method and a `loop` attribute (set
+	when it is added). Adding a channel doesn't need another thread, and nothing on the loop ever
+	blocks the pygame loop.
+	"""
+	def __init__(self):
+		self.loop = asyncio.new_event_loop()
+		self.thread = threading.Thread(target=self.run_loop, name="network", daemon=True)
+		self.channels = []
+
+	def add(self, channel):
+		"""
+		Parameters
+		----------
+		channel : ControlSend | FeedbackReceive | CameraReceive
+			Channel to run on the loop once it starts
+		"""
+		channel.loop = self.loop
+		self.channels.append(channel)
+
+	def start(self):
+		"""Start the loop thread and every channel that has been added"""
+		self.thread.start()
+		for channel in self.channels:
+			asyncio.run_coroutine_threadsafe(self.run_channel(channel), self.loop)
+
+	def stop(self, timeout=1.0):
+		"""Stop the channels then the loop, after anything already queued on it (eg a final QUIT_ROVER)"""
+		for channel in self.channels:
+			channel.stop()
+
+		asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop)
+		self.thread.join(timeout)
+
+	async def shutdown(self):
+		"""Cancel every channel (closing its sockets) and stop the loop"""
+		tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+		for task in tasks:
+			task.cancel()
+
+		await asyncio.gather(*tasks, return_exceptions=True)
+		self.loop.stop()
+
+	def run_loop(self):
+		asyncio.set_event_loop(self.loop)
+		self.loop.run_forever()
+
+	async def run_channel(self, channel):
+		"""Run a channel, printing any exception that stops it instead of losing it in a future"""
+		try:
+			await channel.run()
+		except Exception:
+			traceback.print_exc()
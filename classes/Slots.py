@@ -0,0 +1,67 @@
+# Import libraries
+import threading
+
+class FrameSlot:
+	"""
+	Thread-safe latest-frame slot for one camera, written by the network thread and read by the UI.
+
+	Putting a frame overwrites the previous one instead of blocking, so a slow reader never holds up
+	the network loop. Frames are numbered as they are put in, so the reader can tell whether there is
+	a new frame without the slot being cleared. Frames that are overwritten before being read are
+	counted as dropped, alongside the number received and displayed. Each frame can carry its capture
+	time, so the reader can measure how old it is when shown.
+	"""
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.value = None # Current frame
+		self.sequence = 0 # Number of frames put in
+		self.read = 0 # Sequence number of the last frame that was read
+		self.capture_time = None # Capture time of the current frame (laptop `time.time()`)
+
+		# (width, height) the frame will be displayed at, so it can be decoded at a reduced size
+		self.target = None
+
+		self.received = 0
+		self.displayed = 0
+		self.dropped = 0
+
+	def put(self, frame, capture_time=None):
+		"""
+		Replace the current frame
+
+		Parameters
+		----------
+		frame : np.ndarray
+			Decoded frame
+		capture_time : float
+			When the frame was captured, converted to the laptop's `time.time()` (None if unknown)
+		"""
+		with self.lock:
+			if self.read < self.sequence:
+				self.dropped += 1
+
+			self.value = frame
+			self.capture_time = capture_time
+			self.sequence += 1
+			self.received += 1
+
+	def get(self, sequence):
+		"""
+		Returns the newest frame, its sequence number and capture time, or (None, sequence, None) if
+		there is nothing newer
+
+		Parameters
+		----------
+		sequence : int
+			Sequence number of the frame the reader already has
+		"""
+		with self.lock:
+			if self.sequence == sequence:
+				return None, sequence, None
+
+			self.read = self.sequence
+			self.displayed += 1
+			return self.value, self.sequence, self.capture_time
+
+	def stats(self) -> dict:
+		return {"received": self.received, "displayed": self.displayed, "dropped": self.dropped}
@@ -4,10 +4,53 @@ import json
 import time
 import socket
 import struct
-import select
-import imagezmq
-import threading
+import random
+import asyncio
+import os
+import zmq
+import zmq.asyncio
 import numpy as np
+from enum import Enum
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.ControlCodec import CODECS, JsonCodec, BinaryCodec, choose_codec
+
+# How long to wait for the rover to pick a control codec before falling back to JSON (seconds)
+NEGOTIATE_TIMEOUT = 0.5
+
+# Reconnect backoff: the delay doubles after every failed attempt, from RECONNECT_MIN up to
+# RECONNECT_MAX, and a random half of it is added as jitter (seconds)
+RECONNECT_MIN = 0.25
+RECONNECT_MAX = 8.0
+CONNECT_TIMEOUT = 2.0
+
+# How often to ping the rover to estimate clock offset and round trip time (seconds)
+PING_INTERVAL = 0.5
+
+# What to do with each command sent while the rover is disconnected
+QUEUE = "queue" # Send once reconnected
+DROP = "drop" # Discard (eg anything that would be stale by the time the rover is back)
+QUEUE_LIMIT = 32 # Most commands to hold while disconnected (oldest are dropped first)
+
+# Camera transports, and the (rover, laptop) ZMQ socket types for each
+REQ_REP = "reqrep"
+PUB_SUB = "pubsub"
+PUSH_PULL = "pushpull"
+CAMERA_SOCKETS = {
+	REQ_REP: (zmq.REQ, zmq.REP),
+	PUB_SUB: (zmq.PUB, zmq.SUB),
+	PUSH_PULL: (zmq.PUSH, zmq.PULL),
+}
+CAMERA_HWM = 4 # Frames that can be queued per socket in the pipelined modes
+
+class LinkState(Enum):
+	DOWN = "down"
+	CONNECTING = "connecting"
+	CONNECTED = "connected"
+
+# Header of datagrams on the axis channel (session id, sequence number)
+AXIS_HEADER = "<II"
 
 class SocketTimeout(Exception):
 	"""
@@ -69,34 +112,314 @@ class SendSocket:
 
 		try:
 			self.socket.sendall(sizes + encoded_fb + b"".join(encoded_imgs))
-		except ConnectionResetError:
+		except (ConnectionResetError, BrokenPipeError):
 			# raise SocketTimeout("Send: Rover connection closed, waiting to reconnect...")
 			print("Send: Connection lost")
 			self.connected = False
 
 
-class ControlSend(SendSocket):
-	def __init__(self, target, port=5001, payload_string="<Hd"):
-		super().__init__(target, port, payload_string)
+class ControlSend:
+	"""
+	Sends control messages to the rover over TCP.
+
+	The connection lives on the network loop, which connects, negotiates the codec and reconnects
+	with exponential backoff in the background. `send` can be called from any thread: it encodes the
+	message and hands it to the loop, so it never blocks on the network. While the rover is
+	disconnected (including if the link drops before the loop writes it), commands are queued or
+	dropped according to `policy`.
+	"""
+	def __init__(self, target, port=5001, payload_string="<Hd", codecs=tuple(CODECS), policy=None, link=None):
+		"""
+		Parameters
+		----------
+		target : str
+			Rover IP address or hostname
+		port : int
+			Rover control port
+		payload_string : str
+			Header format of the JSON codec (used until a codec has been negotiated)
+		codecs : tuple[str]
+			Names of the codecs to offer to the rover, in order of preference
+		policy : dict
+			QUEUE or DROP for each command name while disconnected (commands not listed are dropped)
+		link : LinkStats
+			Clock sync updated from the rover's replies to pings (no pings are sent if None)
+		"""
+		self.target = target
+		self.port = port
+		self.payload_string = payload_string
+
+		self.codecs = codecs
+		self.fallback = JsonCodec(payload_string)
+		self.codec = self.fallback
+
+		self.loop = None # Set by NetworkLoop.add
+		self.writer = None
+		self.state = LinkState.DOWN
+		self.running = False
+
+		# Commands held while disconnected
+		self.policy = {} if policy is None else policy
+		self.pending = deque(maxlen=QUEUE_LIMIT)
+		self.dropped = 0
+
+		self.link = link
+
+	@property
+	def connected(self):
+		return self.state == LinkState.CONNECTED
+
+	def check_connection(self):
+		"""Returns whether the rover is connected (reconnecting happens on the network loop)"""
+		return self.connected
+
+	def stop(self):
+		self.running = False
+
+	async def run(self):
+		"""Keep a connection to the rover open, reconnecting whenever it drops"""
+		self.running = True
+		attempts = 0
+
+		while self.running:
+			self.state = LinkState.CONNECTING
+			try:
+				reader, writer = await asyncio.wait_for(
+					asyncio.open_connection(self.target, self.port), CONNECT_TIMEOUT
+				)
+			except (OSError, asyncio.TimeoutError):
+				self.state = LinkState.DOWN
+				await asyncio.sleep(self.backoff(attempts))
+				attempts += 1
+				continue
+
+			print(f"Send socket connected to port {self.port}")
+			attempts = 0
+			await self.negotiate(reader, writer)
+			self.writer = writer
+			self.state = LinkState.CONNECTED
+			self.flush()
+
+			pinger = asyncio.create_task(self.ping_loop()) if self.link is not None else None
+			try:
+				# Replies from the rover use the JSON framing, and reading them also detects the connection closing
+				while True:
+					header = self.fallback.header.unpack(await reader.readexactly(self.fallback.header.size))
+					reply = self.fallback.decode(header, await reader.readexactly(self.fallback.body_size(header)))
+					self.process_reply(reply)
+			except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+				pass
+			finally:
+				if pinger is not None:
+					pinger.cancel()
+
+			print("Send: Connection lost")
+			self.state = LinkState.DOWN
+			self.writer = None
+			writer.close()
+
+	async def ping_loop(self):
+		"""Regularly send the laptop's time so the rover can reply with a PONG"""
+		while True:
+			self.writer.write(self.codec.encode({"PING": time.time_ns()}))
+			await asyncio.sleep(PING_INTERVAL)
+
+	def process_reply(self, reply:dict):
+		"""Handle a message sent back by the rover on the control link"""
+		if "PONG" in reply:
+			t0, t1, t2 = reply["PONG"]
+			self.link.clock.add(t0, t1, t2, time.time_ns())
+
+	def backoff(self, attempts):
+		"""Delay before the next connection attempt: exponential, with jitter so retries don't synchronise"""
+		delay = min(RECONNECT_MAX, RECONNECT_MIN * 2 ** attempts)
+		return delay / 2 + random.uniform(0, delay / 2)
+
+	async def negotiate(self, reader, writer):
+		"""
+		Offer the supported codecs to the rover and use whichever one it replies with.
+		If the rover doesn't reply in time (eg older rover code), keep using JSON
+		"""
+		self.codec = self.fallback
+		writer.write(self.fallback.encode({"HELLO": {"CODECS": list(self.codecs)}}))
+
+		try:
+			encoded_header = await asyncio.wait_for(reader.readexactly(self.fallback.header.size), NEGOTIATE_TIMEOUT)
+			header = self.fallback.header.unpack(encoded_header)
+			reply = self.fallback.decode(header, await reader.readexactly(self.fallback.body_size(header)))
+
+			if reply.get("CODEC") in self.codecs:
+				self.codec = CODECS[reply["CODEC"]]
+		except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+			pass
+
+		print(f"Control codec: {self.codec.name}")
 
 	def send(self, message):
-		"""Encode, calculate sizes and send feedback"""
-		encoded_message = json.dumps(message).encode()
-		message_size = len(encoded_message)
+		"""Encode with the negotiated codec and hand to the network loop (held by policy if disconnected)"""
+		if self.connected:
+			self.loop.call_soon_threadsafe(self.write, message, self.codec.encode(message))
+		else:
+			self.loop.call_soon_threadsafe(self.hold, message)
+
+	def write(self, message, data):
+		"""Write an encoded message to the connection, or hold it if the link dropped since `send` (runs on the network loop)"""
+		if self.writer is not None:
+			self.writer.write(data)
+		else:
+			self.hold(message)
+
+	def hold(self, message):
+		"""Keep the commands that should be queued until the rover reconnects (runs on the network loop)"""
+		if self.connected:
+			# Reconnected since `send` was called
+			self.writer.write(self.codec.encode(message))
+			return
 
-		sizes = struct.pack(self.payload_string, message_size, time.time())
+		queued = dict((key, value) for key, value in message.items() if self.policy.get(key, DROP) == QUEUE)
+		self.dropped += len(message) - len(queued)
+
+		if queued:
+			if len(self.pending) == self.pending.maxlen:
+				self.dropped += len(self.pending[0])
+			self.pending.append(queued)
+
+	def flush(self):
+		"""Send everything queued while disconnected, in order (runs on the network loop)"""
+		while self.pending:
+			self.writer.write(self.codec.encode(self.pending.popleft()))
+
+
+class AxisSend:
+	"""
+	Sends continuous axis values to the rover as UDP datagrams.
+
+	Every datagram holds the full axis state (binary codec) behind a `"<II"` header of session id and
+	sequence number. A lost datagram is simply superseded by the next one, so it can never hold up
+	later drive commands the way a lost TCP segment does
+	"""
+
+	def __init__(self, target, port=5003):
+		self.target = target
+		self.port = port
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.socket.setblocking(False)
+
+		self.header = struct.Struct(AXIS_HEADER)
+		self.codec = CODECS[BinaryCodec.name]
+
+		# Random session id so the rover can tell when the laptop has restarted its sequence numbers
+		self.session = random.getrandbits(32)
+		self.sequence = 0
+
+	def send(self, axes:dict):
+		"""Send the full axis state"""
+		self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+		datagram = self.header.pack(self.session, self.sequence) + self.codec.encode(axes)
 
 		try:
-			self.socket.sendall(sizes + encoded_message)
-		except select.error:
-			self.stop()
-			self.connected = False
-			# raise SocketTimeout("Send: Rover connection closed, waiting to reconnect...")
+			self.socket.sendto(datagram, (self.target, self.port))
+		except OSError:
+			# Nothing to do: the next datagram replaces this one anyway
+			pass
+
+
+class RecvBuffer:
+	"""
+	Preallocated buffer that incoming data is received straight into with `recv_into`
+
+	Unread bytes are kept between `start` and `end`. Messages are returned as `memoryview` slices of
+	the buffer (no copies), so a returned message is only valid until the next call to `read`.
+	When there isn't enough space left after `start`, the unread bytes are moved back to the front of
+	the buffer, and the buffer is only reallocated if a single message is larger than it.
+	"""
+
+	def __init__(self, capacity=65536):
+		self.data = bytearray(capacity)
+		self.view = memoryview(self.data)
+		self.start = 0
+		self.end = 0
+
+	def clear(self):
+		"""Discard any unread data (eg after a reconnect)"""
+		self.start = 0
+		self.end = 0
+
+	def reserve(self, size):
+		"""Make sure a message of `size` bytes fits in the buffer from `start`"""
+		if self.start + size <= len(self.data):
+			return
+
+		unread = self.end - self.start
+		if size > len(self.data):
+			# Message is bigger than the buffer, so grow it
+			data = bytearray(max(size, 2 * len(self.data)))
+			data[:unread] = self.view[self.start:self.end]
+			self.data = data
+			self.view = memoryview(self.data)
+		else:
+			# Move the unread bytes back to the front
+			self.view[:unread] = self.view[self.start:self.end]
+
+		self.start = 0
+		self.end = unread
+
+	def take(self, size):
+		"""Return the next `size` bytes (which must already be in the buffer) as a memoryview"""
+		message = self.view[self.start:self.start + size]
+		self.start += size
+
+		# Buffer fully read, so start filling from the front again
+		if self.start == self.end:
+			self.clear()
+
+		return message
+
+	def read(self, conn, size):
+		"""
+		Receive until `size` bytes are available and return them as a memoryview
+
+		Parameters
+		----------
+		conn : socket.socket
+			Connected (blocking) socket to receive from
+		size : int
+			Number of bytes to return
+		"""
+		self.reserve(size)
+
+		while self.end - self.start < size:
+			try:
+				received = conn.recv_into(self.view[self.end:])
+			except ConnectionResetError:
+				raise SocketTimeout("Receive: Connection reset")
+
+			if received == 0:
+				raise SocketTimeout("Receive: Connection closed")
+			self.end += received
+
+		return self.take(size)
+
+	async def read_async(self, loop, conn, size):
+		"""Same as `read`, but waits for data on the event loop (`conn` must be non-blocking)"""
+		self.reserve(size)
+
+		while self.end - self.start < size:
+			try:
+				received = await loop.sock_recv_into(conn, self.view[self.end:])
+			except ConnectionResetError:
+				raise SocketTimeout("Receive: Connection reset")
+
+			if received == 0:
+				raise SocketTimeout("Receive: Connection closed")
+			self.end += received
+
+		return self.take(size)
 
 
 class ReceiveSocket:
 	"""
-	Handles receiving information over socket
+	Handles receiving information over socket (runs on the network loop)
 	"""
 
 	def __init__(self, port, payload_string):
@@ -104,117 +427,498 @@ class ReceiveSocket:
 		self.port = port
 		self.conn = None
 
+		self.loop = None # Set by NetworkLoop.add
 		self.running = False
 
-		self.overflow = b""
+		self.buffer = RecvBuffer()
 		self.payload_string = payload_string
 		self.payload_size = struct.calcsize(self.payload_string)
 
-	def accept(self):
+	async def accept(self):
 		"""Connects/ reconnects to incoming traffic"""
 		if self.socket is None:
 			print("No open socket to connect to")
 			return
-		self.conn, _ = self.socket.accept()
+		if self.conn is not None:
+			self.conn.close()
+
+		self.conn, _ = await self.loop.sock_accept(self.socket)
+		self.buffer.clear()
 		print(f"Receive socket connected to port {self.port}")
 
-	def recv_data(self, size=None):
-		"""Receive encoded data of specified size over socket"""
+	async def recv_data(self, size=None):
+		"""
+		Receive encoded data of specified size over socket
+
+		The data is returned as a memoryview into the receive buffer, so it must be used (or copied)
+		before the next call to `recv_data`
+		"""
 		if size is None:
 			size = self.payload_size
 
-		data = self.overflow
-		start_time = time.perf_counter()
-
-		while len(data) < size:
-			try:
-				data += self.conn.recv(4096)
-			except ConnectionResetError:
-				raise SocketTimeout("Receive: Connection reset")
-
-			if time.perf_counter() - start_time > 0.5 and False:  # temporarily disable this function
-				raise SocketTimeout("Receive: Timeout")
-
-		self.overflow = data[size:]
-		return data[:size]
-
-	def start(self):
-		self.running = True
-		threading.Thread(target=self.receive_loop, daemon=True).start()
+		return await self.buffer.read_async(self.loop, self.conn, size)
 
 	def stop(self):
 		self.running = False
 
-	def process_data(self, data):
+	async def process_data(self, data):
 		return
 
-	def receive_loop(self):
+	async def run(self):
+		self.running = True
+
 		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as self.socket:
 
 			# set socket options and get incoming connections
 			self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 			self.socket.bind(("", self.port))
 			self.socket.listen(1)
-			self.accept()
+			self.socket.setblocking(False)
+			await self.accept()
 
 			while self.running:
 				try:
 					# Unpack the size of the encoded feedback and images
-					encoded_sizes = self.recv_data()
+					encoded_sizes = await self.recv_data()
 					# split the initial data received into the timestamp and the sizes
 					data = struct.unpack(self.payload_string, encoded_sizes)
 
-					self.process_data(data)
+					await self.process_data(data)
 
 				except SocketTimeout as st:
 					print(st.message)
 					print("Receive: Wait for reconnect")
 					# re-initialise the socket connection
-					self.socket.listen(1)
-					self.accept()
+					await self.accept()
 					print("Receive: Reconnected")
 
 
 class FeedbackReceive(ReceiveSocket):
-	def __init__(self, fb_queue, port=5002, payload_string="<Hd"):
+	def __init__(self, store, port=5002, payload_string="<Hd", link=None, recorder=None):
 		super().__init__(port, payload_string)
 
-		self.fb_queue = fb_queue
+		self.store = store
+		self.link = link
+		self.recorder = recorder
+
+	async def process_data(self, data):
+		# Record how old the message is (the header holds the rover's send time)
+		if self.link is not None:
+			self.link.record("feedback", data[-1])
+
+		# Receive and decode feedback, then merge into the telemetry store if not empty
+		encoded_feedback = await self.recv_data(data[0])
 
-	def process_data(self, data):
-		# Receive and decode feedback, then queue if not empty
-		encoded_feedback = self.recv_data(data[0])
+		# The receive buffer is reused, so the recorder gets a copy
+		if self.recorder is not None:
+			self.recorder.record_feedback(bytes(encoded_feedback), data[-1])
 
-		fb = json.loads(encoded_feedback.decode())
+		fb = json.loads(str(encoded_feedback, "utf-8"))
 		if fb:
-			self.fb_queue.put(fb)
+			self.store.update(fb)
 
-class CameraReceive():
+class AxisReceive:
+	"""
+	Rover side of the axis channel. Keeps only the newest axis state: any datagram with a sequence
+	number that isn't newer than the last one accepted (lost ordering or duplicates) is dropped.
+
+	A datagram with a new session id (the laptop restarted) starts a new sequence, but late datagrams
+	from the session before it are still dropped, so they can't flip the receiver back to stale axes.
+	Datagrams too short or corrupt to decode are dropped and counted as malformed
+	"""
+
+	def __init__(self, port=5003):
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.socket.bind(("", port))
+
+		self.header = struct.Struct(AXIS_HEADER)
+		self.codec = CODECS[BinaryCodec.name]
+
+		self.session = None
+		self.previous_session = None
+		self.sequence = 0
+		self.received = 0
+		self.dropped = 0
+		self.malformed = 0
+
+	def process_datagram(self, datagram):
+		"""Returns the decoded axis state, or None if the datagram is out of date or malformed"""
+		if len(datagram) < self.header.size + self.codec.header.size:
+			self.malformed += 1
+			return None
+
+		session, sequence = self.header.unpack_from(datagram)
+
+		# Sequence numbers wrap, so "newer" means less than half the number range ahead
+		newer = 0 < (sequence - self.sequence) & 0xFFFFFFFF < 0x80000000
+		if session == self.previous_session or (session == self.session and not newer):
+			self.dropped += 1
+			return None
+
+		try:
+			body = memoryview(datagram)[self.header.size:]
+			header = self.codec.header.unpack_from(body)
+			axes = self.codec.decode(header, body[self.codec.header.size:])
+		except (struct.error, ValueError):
+			self.malformed += 1
+			return None
+
+		if session != self.session:
+			self.previous_session, self.session = self.session, session
+		self.sequence = sequence
+		self.received += 1
+		return axes
+
+	def recv(self, timeout=None):
+		"""
+		Wait for the next up to date axis state (returns None on timeout)
+
+		Parameters
+		----------
+		timeout : float
+			Seconds to wait, or None to wait forever
+		"""
+		self.socket.settimeout(timeout)
+		try:
+			while True:
+				axes = self.process_datagram(self.socket.recv(1024))
+				if axes is not None:
+					return axes
+		except socket.timeout:
+			return None
+
+class ControlReceive:
 	"""
-	Handles receiving camera images from rover
+	Rover side of the control channel (used by the rover stand-ins). Accepts the laptop's `ControlSend`
+	connection, agrees a codec in reply to its "HELLO", answers "PING"s with a "PONG" of the receive and
+	send times, and passes every other command to a handler. Replies use the JSON framing
 	"""
-	def __init__(self, queues):
+
+	def __init__(self, port=5001, poll=0.5):
+		"""
+		Parameters
+		----------
+		port : int
+			Control port to listen on
+		poll : float
+			How often (seconds) blocking calls check whether `stop` has been called
+		"""
+		self.port = port
+		self.poll = poll
 		self.running = False
-		self.queues = queues
 
-		self.ih = imagezmq.ImageHub()
-		self.start()
+		self.reply_codec = JsonCodec()
+		self.codec = self.reply_codec
+		self.buffer = RecvBuffer()
+		self.header = None # Header of a message whose body hasn't arrived yet
 
-	def start(self):
+	def stop(self):
+		self.running = False
+
+	def run(self, handle):
+		"""
+		Serve laptop connections one after another until stopped
+
+		Parameters
+		----------
+		handle : callable
+			Called with each decoded command dict (other than pings)
+		"""
 		self.running = True
-		threading.Thread(target=self.receive_loop, daemon=True).start()
+
+		with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+			server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			server.bind(("", self.port))
+			server.listen(1)
+			server.settimeout(self.poll)
+
+			while self.running:
+				try:
+					conn, _ = server.accept()
+				except socket.timeout:
+					continue
+
+				print(f"Control connected on port {self.port}")
+				with conn:
+					conn.settimeout(self.poll)
+					self.serve(conn, handle)
+				print("Control: Connection lost")
+
+	def serve(self, conn, handle):
+		"""Handle one connection's messages until it closes"""
+		self.codec = self.reply_codec
+		self.buffer.clear()
+		self.header = None
+
+		while self.running:
+			try:
+				message = self.read(conn)
+			except socket.timeout:
+				continue
+			except (SocketTimeout, OSError, ValueError):
+				return
+
+			# Codec negotiation (older laptops don't send a HELLO, and keep using JSON)
+			if "HELLO" in message:
+				name = choose_codec(message["HELLO"].get("CODECS", []))
+				conn.sendall(self.reply_codec.encode({"CODEC": name}))
+				self.codec = CODECS[name]
+				continue
+
+			if "PING" in message:
+				received = time.time_ns()
+				conn.sendall(self.reply_codec.encode({"PONG": [message.pop("PING"), received, time.time_ns()]}))
+
+			message.pop("TIME", None)
+			message.pop("TIME_NS", None)
+			if message:
+				handle(message)
+
+	def read(self, conn) -> dict:
+		"""Receive and decode the next message with the current codec (can be retried after a timeout)"""
+		if self.header is None:
+			self.header = self.codec.header.unpack(self.buffer.read(conn, self.codec.header.size))
+
+		body = self.buffer.read(conn, self.codec.body_size(self.header))
+		header, self.header = self.header, None
+		return self.codec.decode(header, body)
+
+# Reduced JPEG decode modes for each reduction factor (grayscale, colour)
+REDUCED_DECODES = {
+	8: (cv2.IMREAD_REDUCED_GRAYSCALE_8, cv2.IMREAD_REDUCED_COLOR_8),
+	4: (cv2.IMREAD_REDUCED_GRAYSCALE_4, cv2.IMREAD_REDUCED_COLOR_4),
+	2: (cv2.IMREAD_REDUCED_GRAYSCALE_2, cv2.IMREAD_REDUCED_COLOR_2),
+}
+
+def decode_jpg(jpg_buffer, flags=cv2.IMREAD_UNCHANGED):
+	"""Decode a JPEG buffer (runs on the decode pool). Returns the image and the decode time (seconds)"""
+	start = time.perf_counter()
+	image = cv2.imdecode(np.frombuffer(jpg_buffer, dtype="uint8"), flags)
+	return image, time.perf_counter() - start
+
+class CameraReceive():
+	"""
+	Handles receiving camera images from rover.
+
+	Speaks the imagezmq `send_jpg` protocol (JSON metadata then the JPEG buffer) on the network loop
+	instead of its own thread. Decoded frames go into one `FrameSlot` per camera, which overwrites
+	instead of blocking, so a slow UI never holds up the rover. The transport is one of:
+	- REQ_REP: imagezmq's default, the rover waits for "OK" after every frame (one frame in flight)
+	- PUB_SUB: imagezmq with `REQ_REP=False`, the rover binds and the laptop connects to it
+	- PUSH_PULL: the rover connects and can have up to `hwm` frames in flight before it blocks
+
+	The imagezmq message is either the camera name, or a dict with "name" and "time" (the rover's
+	`time.time()` at capture) so the frame's age can be recorded, and optionally "id" (the rover's frame
+	number) so frames lost on the way can be counted.
+
+	JPEGs are decoded on a pool of worker threads (`cv2.imdecode` releases the GIL), so several
+	cameras decode in parallel. Decodes can finish out of order, so a frame is only published if it
+	is newer than the last one published for its camera.
+
+	When a camera's slot has a `target` size (set from the layout) at least 2x smaller than the
+	source, the JPEG is decoded at 1/2, 1/4 or 1/8 resolution, which is much cheaper than decoding
+	at full size and resizing down.
+
+	Bytes, decode time and frame ages are totalled per camera (see `stats`) for the
+	`QualityController`. If there is a `recorder`, every JPEG is also recorded as it arrived.
+	"""
+	def __init__(self, slots, address="tcp://*:5555", link=None, mode=REQ_REP, hwm=CAMERA_HWM, workers=os.cpu_count(), recorder=None):
+		"""
+		Parameters
+		----------
+		slots : dict
+			Dictionary with keys as camera names and values as FrameSlot
+		address : str
+			ZMQ address to bind to (or to connect to, for PUB_SUB)
+		link : LinkStats
+			Where to record the age of each frame (if the rover sends capture times)
+		mode : str
+			Camera transport (REQ_REP, PUB_SUB or PUSH_PULL)
+		hwm : int
+			ZMQ receive high-water mark: the most frames queued on the laptop side
+		workers : int
+			Number of decode threads
+		recorder : MissionRecorder
+			Where to record the frames, if anywhere
+		"""
+		self.running = False
+		self.slots = slots
+		self.address = address
+		self.link = link
+		self.mode = mode
+		self.hwm = hwm
+		self.recorder = recorder
+
+		# Decode pool, and per camera numbers of the last frame received and published
+		self.workers = workers
+		self.pool = None
+		self.received = dict.fromkeys(slots, 0)
+		self.published = dict.fromkeys(slots, 0)
+		self.decoding = set()
+
+		# Full resolution (width, height) and whether each camera is grayscale, from its last frame
+		self.sources = {}
+
+		# Per camera totals: JPEG bytes, decode time (s), and the sum and count of frame ages (s)
+		self.bytes = dict.fromkeys(slots, 0)
+		self.decode_time = dict.fromkeys(slots, 0.0)
+		self.ages = dict((name, [0.0, 0]) for name in slots)
+
+		# Last frame id from the rover, and frames missing from the ids (lost before reaching the laptop)
+		self.ids = dict.fromkeys(slots, None)
+		self.skipped = dict.fromkeys(slots, 0)
+
+		self.loop = None # Set by NetworkLoop.add
 
 	def stop(self):
 		self.running = False
 
-	def receive_loop(self):
-		while self.running:
-			name, image = self.ih.recv_jpg()
+	async def run(self):
+		self.running = True
+		self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="decode")
+
+		# Limit the decodes waiting for a worker, so a backlog stays in ZMQ (bounded by the HWM)
+		in_flight = asyncio.Semaphore(2 * self.workers)
+
+		try:
+			with zmq.asyncio.Context.instance().socket(CAMERA_SOCKETS[self.mode][1]) as hub:
+				hub.setsockopt(zmq.RCVHWM, self.hwm)
+
+				if self.mode == PUB_SUB:
+					hub.setsockopt(zmq.SUBSCRIBE, b"")
+					hub.connect(self.address)
+				else:
+					hub.bind(self.address)
+
+				while self.running:
+					metadata = await hub.recv_json()
+					jpg_buffer = await hub.recv(copy=False)
+
+					# Let the rover send the next frame while this one is decoded
+					if self.mode == REQ_REP:
+						await hub.send(b"OK")
+
+					await in_flight.acquire()
+					task = asyncio.ensure_future(self.process_frame(metadata["msg"], jpg_buffer))
+					task.add_done_callback(lambda task: in_flight.release())
+
+					# Keep a reference so the task isn't garbage collected while decoding
+					self.decoding.add(task)
+					task.add_done_callback(self.decoding.discard)
+		finally:
+			self.pool.shutdown(wait=False, cancel_futures=True)
+
+	async def process_frame(self, name, jpg_buffer):
+		"""Decode a frame on the pool and put it in its camera's slot, unless a newer frame got there first"""
+		age = None
+		remote_time = None
+		frame_id = None
+		if isinstance(name, dict):
+			remote_time = name.get("time")
+			frame_id = name.get("id")
+			if self.link is not None and remote_time is not None:
+				age = self.link.record(name["name"], remote_time)
+			name = name["name"]
+
+		# The ZMQ frame isn't reused, so it is recorded without copying
+		if self.recorder is not None:
+			self.recorder.record_frame(name, jpg_buffer, remote_time)
+
+		if name not in self.slots:
+			return
+
+		self.received[name] += 1
+		self.bytes[name] += len(jpg_buffer)
+		if frame_id is not None:
+			if self.ids[name] is not None and frame_id > self.ids[name] + 1:
+				self.skipped[name] += frame_id - self.ids[name] - 1
+			self.ids[name] = frame_id
+		if age is not None:
+			self.ages[name][0] += age
+			self.ages[name][1] += 1
+		number = self.received[name]
+
+		reduction, flags = self.decode_mode(name)
+		image, elapsed = await self.loop.run_in_executor(self.pool, decode_jpg, jpg_buffer, flags)
+		self.decode_time[name] += elapsed
+		if image is None:
+			return
+
+		self.sources[name] = (image.shape[1] * reduction, image.shape[0] * reduction, image.ndim == 2)
+
+		# Capture time on the laptop's clock
+		capture_time = None
+		if remote_time is not None:
+			capture_time = remote_time - (self.link.clock.offset if self.link is not None else 0)
+
+		if number > self.published[name]:
+			self.published[name] = number
+			self.slots[name].put(image, capture_time)
+
+	def decode_mode(self, name):
+		"""Returns the largest reduction factor that still gives at least the target size, and its decode flags"""
+		source = self.sources.get(name)
+		target = self.slots[name].target
+		if source is None or target is None:
+			return 1, cv2.IMREAD_UNCHANGED
+
+		width, height, grayscale = source
+		scale = min(target[0] / width, target[1] / height)
+
+		for reduction, flags in REDUCED_DECODES.items():
+			if scale * reduction <= 1:
+				return reduction, flags[0 if grayscale else 1]
+
+		return 1, cv2.IMREAD_UNCHANGED
+
+	def stats(self) -> dict:
+		"""
+		Returns running totals for each camera: frames and JPEG bytes received, frames lost before
+		reaching the laptop, decode time (s), and the sum (s) and count of the frame ages that were recorded
+		"""
+		return dict((name, {
+			"frames": self.received[name],
+			"skipped": self.skipped[name],
+			"bytes": self.bytes[name],
+			"decode": self.decode_time[name],
+			"age": self.ages[name][0],
+			"aged": self.ages[name][1]
+		}) for name in self.slots)
+
+class CameraSend:
+	"""
+	Rover side of the camera channel (used by the rover stand-ins). Sends JPEG frames with the imagezmq
+	`send_jpg` framing over any of the camera transports, so it also works with `imagezmq.ImageHub`
+	"""
+	def __init__(self, address, mode=REQ_REP, hwm=CAMERA_HWM):
+		"""
+		Parameters
+		----------
+		address : str
+			ZMQ address of the laptop to connect to (or to bind to, for PUB_SUB)
+		mode : str
+			Camera transport (REQ_REP, PUB_SUB or PUSH_PULL)
+		hwm : int
+			ZMQ send high-water mark: the most frames in flight before frames are dropped (PUB_SUB)
+			or `send_jpg` blocks (PUSH_PULL)
+		"""
+		self.mode = mode
+		self.socket = zmq.Context.instance().socket(CAMERA_SOCKETS[mode][0])
+		self.socket.setsockopt(zmq.SNDHWM, hwm)
+
+		if mode == PUB_SUB:
+			self.socket.bind(address)
+		else:
+			self.socket.connect(address)
 
-			image = cv2.imdecode(np.frombuffer(image, dtype="uint8"), -1)
+	def send_jpg(self, msg, jpg_buffer):
+		"""Send a frame (waits for the laptop's reply in REQ_REP mode)"""
+		self.socket.send_json({"msg": msg}, zmq.SNDMORE)
+		self.socket.send(jpg_buffer, copy=False)
 
-			if name in self.queues:
-				self.queues[name].put(image)
+		if self.mode == REQ_REP:
+			return self.socket.recv()
 
-			cv2.waitKey(1)
-			self.ih.send_reply(b"OK")
\ No newline at end of file
+	def close(self):
+		self.socket.close()
\ No newline at end of file
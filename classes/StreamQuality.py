@@ -0,0 +1,261 @@
+# Import libraries
+import cv2
+import time
+
+# Quality levels from best to worst: (fraction of the displayed size, JPEG quality, fps)
+LEVELS = [
+	(1.0, 80, 30),
+	(1.0, 70, 30),
+	(1.0, 60, 20),
+	(0.75, 60, 20),
+	(0.75, 50, 15),
+	(0.5, 50, 15),
+	(0.5, 40, 10),
+	(0.35, 40, 10),
+	(0.25, 35, 5),
+]
+
+# Size frames are requested at before the layout has set a slot's target
+DEFAULT_SIZE = (640, 480)
+
+def jpeg_bits_per_pixel(quality):
+	"""Rough JPEG size model (bits per pixel at a given quality), corrected per camera by measurement"""
+	return 0.3 + 0.025 * quality
+
+class QualityController:
+	"""
+	Laptop side of the stream quality loop. Measures each camera's bandwidth, frame age, decode time
+	and display drops, and decides the resolution, JPEG quality and frame rate the rover should send.
+
+	The cameras share a bandwidth budget which is adjusted AIMD style: when frames start arriving late
+	(the radio link is queueing) or decoding can't keep up, the budget is cut to 70% of what is getting
+	through, otherwise it grows by `growth` per interval while it is being used. Cameras with the
+	largest tiles (eg the enlarged feed) choose their level first, leaving enough for the rest to have
+	the lowest level. Requested sizes are never bigger than the tile the frame is shown in, and the
+	frame rate of a camera whose frames are being dropped by the UI is capped at what it displays.
+	"""
+	def __init__(self, camera, slots, budget=2e6, min_budget=50e3, max_budget=20e6, interval=0.5,
+			max_age=0.25, decode_share=0.8, growth=1.1, resend=2.0):
+		"""
+		Parameters
+		----------
+		camera : CameraReceive
+			Camera channel to take measurements from
+		slots : dict
+			Dictionary with keys as camera names and values as FrameSlot
+		budget : float
+			Starting bandwidth budget (bytes/s)
+		min_budget, max_budget : float
+			Limits of the bandwidth budget (bytes/s)
+		interval : float
+			Seconds between updates
+		max_age : float
+			Mean frame age (s) above which the link is treated as congested
+		decode_share : float
+			Fraction of the decode pool's time that decoding may use before it counts as congestion
+		growth : float
+			Factor the budget grows by each uncongested interval
+		resend : float
+			Seconds after which unchanged targets are sent again (eg in case the rover restarted)
+		"""
+		self.camera = camera
+		self.slots = slots
+		self.budget = budget
+		self.min_budget = min_budget
+		self.max_budget = max_budget
+		self.interval = interval
+		self.max_age = max_age
+		self.decode_share = decode_share
+		self.growth = growth
+		self.resend = resend
+
+		self.levels = dict.fromkeys(slots, 0)
+		self.targets = {}
+		self.fps_caps = dict.fromkeys(slots, None)
+		self.efficiency = dict.fromkeys(slots, 1.0) # Measured bytes per frame over the size model
+
+		self.previous = None # Measurements at the last update
+		self.last_update = time.monotonic()
+		self.last_sent = 0
+		self.hold = 0 # Intervals to wait after a cut before cutting again, while the link drains
+
+		self.congested = False
+		self.throughput = 0.0
+
+	def update(self, now=None):
+		"""
+		Measure and re-plan every `interval`. Returns the targets to send to the rover (a dict of camera
+		name to {"width", "height", "quality", "fps"}) when they have changed or are due to be resent,
+		otherwise None
+		"""
+		now = time.monotonic() if now is None else now
+		elapsed = now - self.last_update
+		if elapsed < self.interval:
+			return None
+		self.last_update = now
+
+		current = (self.camera.stats(), dict((name, slot.stats()) for name, slot in self.slots.items()))
+		if self.previous is not None:
+			self.measure(current, self.previous, elapsed)
+		self.previous = current
+
+		targets = self.allocate()
+		if targets != self.targets or now - self.last_sent > self.resend:
+			self.targets = targets
+			self.last_sent = now
+			return targets
+
+		return None
+
+	def measure(self, current, previous, elapsed):
+		"""Adjust the budget, size model and frame rate caps from the change in measurements over an interval"""
+		camera, slots = current
+		camera_before, slots_before = previous
+
+		# Frames still arriving from before a change of targets would throw off the size model
+		settled = not (self.congested or self.hold)
+
+		total_bytes = 0
+		ages = [0.0, 0]
+		decode = 0.0
+
+		for name in self.slots:
+			frames = camera[name]["frames"] - camera_before[name]["frames"]
+			size = camera[name]["bytes"] - camera_before[name]["bytes"]
+			total_bytes += size
+			decode += camera[name]["decode"] - camera_before[name]["decode"]
+			ages[0] += camera[name]["age"] - camera_before[name]["age"]
+			ages[1] += camera[name]["aged"] - camera_before[name]["aged"]
+
+			# Correct the size model for this camera's scene
+			if settled and frames and name in self.targets:
+				target = self.targets[name]
+				predicted = self.frame_bytes(name, target["width"], target["height"], target["quality"]) / self.efficiency[name]
+				self.efficiency[name] = 0.5 * self.efficiency[name] + 0.5 * (size / frames) / predicted
+
+			# Don't ask for more frames than the UI manages to show (an occasional drop is just frames arriving together)
+			displayed = slots[name]["displayed"] - slots_before[name]["displayed"]
+			dropped = slots[name]["dropped"] - slots_before[name]["dropped"]
+			if dropped > 0.1 * frames:
+				self.fps_caps[name] = max(LEVELS[-1][2], displayed / elapsed)
+			elif self.fps_caps[name] is not None:
+				self.fps_caps[name] = self.fps_caps[name] * self.growth
+				if self.fps_caps[name] >= LEVELS[0][2]:
+					self.fps_caps[name] = None
+
+		self.throughput = total_bytes / elapsed
+		late = ages[1] > 0 and ages[0] / ages[1] > self.max_age
+		overloaded = decode / elapsed > self.decode_share * self.camera.workers
+		self.congested = late or overloaded
+
+		if self.hold:
+			self.hold -= 1
+		elif self.congested:
+			self.budget = max(self.min_budget, 0.7 * min(self.budget, self.throughput))
+			self.hold = 2
+		elif self.throughput > 0.5 * self.budget:
+			self.budget = min(self.max_budget, self.budget * self.growth)
+
+	def frame_bytes(self, name, width, height, quality):
+		"""Predicted size (bytes) of a frame from a camera"""
+		return width * height * jpeg_bits_per_pixel(quality) / 8 * self.efficiency[name]
+
+	def level_target(self, name, level):
+		"""Returns the target for a camera at a quality level, and its predicted bandwidth (bytes/s)"""
+		fraction, quality, fps = LEVELS[level]
+		if self.fps_caps[name] is not None:
+			fps = min(fps, self.fps_caps[name])
+
+		size = self.slots[name].target or DEFAULT_SIZE
+		width, height = int(size[0] * fraction), int(size[1] * fraction)
+
+		target = {"width": width, "height": height, "quality": quality, "fps": round(fps, 1)}
+		return target, self.frame_bytes(name, width, height, quality) * fps
+
+	def allocate(self) -> dict:
+		"""Share the budget between the cameras, largest tile first"""
+		def area(name):
+			size = self.slots[name].target or DEFAULT_SIZE
+			return size[0] * size[1]
+		names = sorted(self.slots, key=area, reverse=True)
+
+		# Bandwidth for every camera at the lowest level, which is kept back for the cameras still to choose
+		lowest = dict((name, self.level_target(name, len(LEVELS) - 1)[1]) for name in names)
+		reserve = sum(lowest.values())
+
+		remaining = self.budget
+		targets = {}
+		for name in names:
+			reserve -= lowest[name]
+			for level in range(len(LEVELS)):
+				target, rate = self.level_target(name, level)
+				if rate <= remaining - reserve:
+					break
+
+			self.levels[name] = level
+			targets[name] = target
+			remaining -= rate
+
+		return targets
+
+	def stats(self) -> dict:
+		"""Returns the budget and throughput (kB/s), whether the link is congested, and each camera's level"""
+		return {
+			"budget": self.budget / 1000,
+			"throughput": self.throughput / 1000,
+			"congested": self.congested,
+			"levels": dict(self.levels)
+		}
+
+class StreamShaper:
+	"""
+	Rover side of the stream quality loop. Holds the targets sent by the laptop ("STREAM" on the control
+	channel) and encodes each camera's frames to match: scaled down to fit the target size, at the target
+	JPEG quality, and skipping frames to keep under the target frame rate
+	"""
+	def __init__(self, quality=80):
+		"""
+		Parameters
+		----------
+		quality : int
+			JPEG quality used for cameras without a target
+		"""
+		self.quality = quality
+		self.targets = {}
+		self.next_frame = {}
+
+	def set_targets(self, targets:dict):
+		"""Replace the targets of the cameras in a "STREAM" message"""
+		self.targets.update(targets)
+
+	def encode(self, name, frame, now=None):
+		"""
+		Returns the JPEG buffer for a captured frame, or None if the frame should be skipped
+
+		Parameters
+		----------
+		name : str
+			Camera name
+		frame : np.ndarray
+			Captured frame
+		now : float
+			Capture time (`time.monotonic()`), if already known
+		"""
+		target = self.targets.get(name)
+		if target is None:
+			return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])[1]
+
+		# Frame rate, allowing the frames to drift a little rather than skip on timer jitter
+		now = time.monotonic() if now is None else now
+		if target.get("fps"):
+			if now < self.next_frame.get(name, 0):
+				return None
+			self.next_frame[name] = max(self.next_frame.get(name, 0) + 1 / target["fps"], now - 0.5 / target["fps"])
+
+		# Scale down (never up) to fit the target size
+		scale = min(target["width"] / frame.shape[1], target["height"] / frame.shape[0])
+		if scale < 1:
+			size = (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale)))
+			frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+		return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(target["quality"])])[1]
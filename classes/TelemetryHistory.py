@@ -0,0 +1,134 @@
+# Import libraries
+import time
+import threading
+import numpy as np
+
+class TelemetryHistory:
+	"""
+	Fixed-capacity history of numeric feedback fields, for plotting.
+
+	Each field is a column of a numpy ring buffer, alongside a column of receive times. Every row is
+	written twice, at `i` and `i + capacity`, so the latest rows are always one contiguous slice and
+	can be handed to numpy without unrolling the ring. Appending is O(1) whatever the capacity.
+
+	`downsample` reduces a time window to the min, max and mean of each of a fixed number of buckets
+	(eg one per pixel of a plot), so drawing an hour of history costs the same as drawing a minute.
+	"""
+	def __init__(self, fields:"list[str]", capacity=3600 * 50):
+		"""
+		Parameters
+		----------
+		fields : list[str]
+			Feedback fields to keep (numeric values only)
+		capacity : int
+			Most samples kept (eg 1 hour at 50 Hz), after which the oldest are overwritten
+		"""
+		self.fields = dict((field, i) for i, field in enumerate(fields))
+		self.capacity = capacity
+
+		self.lock = threading.Lock()
+		self.times = np.zeros(2 * capacity, dtype=np.float64)
+		self.values = np.full((len(fields), 2 * capacity), np.nan, dtype=np.float32)
+		self.last = np.full(len(fields), np.nan, dtype=np.float32) # Latest value of each field
+		self.next = 0 # Position (0 to capacity - 1) the next sample is written at
+		self.count = 0
+		self.appended = 0
+
+	def append(self, fb:dict, t=None):
+		"""
+		Add a sample of the fields in a feedback message. Fields missing from the message keep their
+		previous value, so every column has a value in every row (NaN before the field is first seen)
+
+		Parameters
+		----------
+		fb : dict
+			Feedback message (fields that aren't kept are ignored)
+		t : float
+			Receive time (default `time.time()`). Times can't go backwards, so the history stays sorted
+		"""
+		t = time.time() if t is None else t
+
+		with self.lock:
+			for key, value in fb.items():
+				i = self.fields.get(key)
+				if i is not None and isinstance(value, (int, float)):
+					self.last[i] = value
+
+			i = self.next
+			if self.count:
+				t = max(t, self.times[i - 1 if i else 2 * self.capacity - 1])
+			self.times[i] = self.times[i + self.capacity] = t
+			self.values[:, i] = self.values[:, i + self.capacity] = self.last
+
+			self.next = (i + 1) % self.capacity
+			self.count = min(self.count + 1, self.capacity)
+			self.appended += 1
+
+	def __len__(self):
+		return self.count
+
+	def window(self, field, start=None, end=None):
+		"""
+		Returns views of the times and values of a field between `start` and `end` (default the whole
+		history). Call with the lock held if the history is being appended to
+
+		Parameters
+		----------
+		field : str
+			Field name
+		start, end : float
+			Time window
+		"""
+		# The latest `count` rows end at the copy of the last row written
+		stop = self.next + self.capacity if self.next else self.capacity
+		times = self.times[stop - self.count:stop]
+		values = self.values[self.fields[field], stop - self.count:stop]
+
+		lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+		hi = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+		return times[lo:hi], values[lo:hi]
+
+	def downsample(self, field, buckets, span=None, end=None):
+		"""
+		Returns the bucket centre times and the min, max and mean of a field in each of `buckets` equal
+		time buckets. Empty buckets are NaN, as are means that include samples from before the field
+		was first seen
+
+		Parameters
+		----------
+		field : str
+			Field name
+		buckets : int
+			Number of buckets (eg the plot's width in pixels)
+		span : float
+			Seconds of history to cover (default all of it)
+		end : float
+			End of the window (default the latest sample)
+		"""
+		mins, maxs, means = (np.full(buckets, np.nan) for _ in range(3))
+
+		with self.lock:
+			if not self.count:
+				return np.full(buckets, np.nan), mins, maxs, means
+
+			last = self.times[(self.next - 1) % self.capacity]
+			end = last if end is None else end
+			start = end - span if span is not None else min(end, self.window(field)[0][0])
+			times, values = self.window(field, start, end)
+
+			edges = np.linspace(start, end, buckets + 1)
+			if len(times):
+				# Index of the first sample in each bucket, and how many samples it holds
+				starts = np.searchsorted(times, edges[:-1], side="left")
+				counts = np.diff(np.append(starts, len(times)))
+				filled = counts > 0
+				firsts = starts[filled]
+
+				mins[filled] = np.fmin.reduceat(values, firsts)
+				maxs[filled] = np.fmax.reduceat(values, firsts)
+				means[filled] = np.add.reduceat(values, firsts, dtype=np.float64) / counts[filled]
+
+		return (edges[:-1] + edges[1:]) / 2, mins, maxs, means
+
+	def stats(self) -> dict:
+		return {"samples": self.count, "appended": self.appended, "capacity": self.capacity}
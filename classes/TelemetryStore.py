@@ -0,0 +1,83 @@
+# Import libraries
+import threading
+from collections import deque
+
+# Feedback fields that are events (every one matters) rather than values where only the latest matters
+EVENT_FIELDS = ("EVENT", "LOG", "ERROR")
+
+# Feedback field holding the rover's position, every one of which is added to the map trail
+POSITION_FIELD = "position"
+
+class TelemetryStore:
+	"""
+	Thread-safe store of the feedback received from the rover, keyed by field name.
+
+	Value fields (eg speed, pitch, battery) are overwritten in place, so however long the UI stalls
+	it only ever sees the latest value of each. Event fields are kept in order in a bounded ring, and
+	the oldest are dropped if the UI falls too far behind. Overwrites and drops are counted so the
+	pressure on the store can be shown.
+
+	If given a `TelemetryHistory`, every message is also appended to it, so the fields can be plotted
+	over time. Likewise every position is appended to `trail` as it arrives, so the path on the map
+	has every sample rather than the latest each frame.
+	"""
+	def __init__(self, event_fields=EVENT_FIELDS, capacity=64, history=None, trail=None):
+		"""
+		Parameters
+		----------
+		event_fields : tuple[str]
+			Names of the fields that are events
+		capacity : int
+			Most events to hold between snapshots
+		history : TelemetryHistory
+			History the value fields are also appended to
+		trail : MapTrail
+			Trail the positions are also appended to
+		"""
+		self.event_fields = set(event_fields)
+		self.history = history
+		self.trail = trail
+
+		self.lock = threading.Lock()
+		self.values = {}
+		self.changed = set()
+		self.events = deque(maxlen=capacity)
+
+		self.updates = 0
+		self.overwrites = 0 # Values replaced before the UI saw them
+		self.drops = 0 # Events pushed out of the ring before the UI saw them
+
+	def update(self, fb:dict):
+		"""Merge a feedback message from the rover into the store"""
+		with self.lock:
+			self.updates += 1
+
+			for key, value in fb.items():
+				if key in self.event_fields:
+					if len(self.events) == self.events.maxlen:
+						self.drops += 1
+					self.events.append((key, value))
+				else:
+					if key in self.changed:
+						self.overwrites += 1
+					self.values[key] = value
+					self.changed.add(key)
+
+		if self.history is not None:
+			self.history.append(fb)
+		if self.trail is not None and POSITION_FIELD in fb:
+			self.trail.append(fb[POSITION_FIELD])
+
+	def snapshot(self):
+		"""Returns a dict of the values that changed and a list of (field, value) events since the last snapshot"""
+		with self.lock:
+			values = dict((key, self.values[key]) for key in self.changed)
+			self.changed = set()
+
+			events = list(self.events)
+			self.events.clear()
+
+		return values, events
+
+	def stats(self) -> dict:
+		return {"updates": self.updates, "overwrites": self.overwrites, "drops": self.drops}
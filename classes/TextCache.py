@@ -0,0 +1,86 @@
+# Import libraries
+import pygame
+from collections import OrderedDict
+
+class TextCache:
+	"""
+	Shared cache of fonts and rendered text.
+
+	Fonts are loaded once for each (family, size). Rendered text surfaces are kept in a least
+	recently used cache keyed by (text, family, size, colour), so labels that don't change (camera
+	names, button captions, "[Feed unavailable]") are rendered once. Text that changes every frame
+	(counters, the clock, telemetry values) is rendered with `cache=False`, as it would rarely be
+	drawn again and would push the labels out of the cache. Hits and misses are counted so the hit
+	rate can be reported.
+	"""
+	def __init__(self, capacity=512):
+		"""
+		Parameters
+		----------
+		capacity : int
+			Most rendered text surfaces to keep
+		"""
+		self.capacity = capacity
+		self.fonts = {}
+		self.surfaces = OrderedDict()
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.uncached = 0
+
+	def font(self, size, family="monospace") -> pygame.font.Font:
+		"""Returns the font for a family and size, loading it the first time"""
+		key = (family, size)
+		font = self.fonts.get(key)
+		if font is None:
+			font = self.fonts[key] = pygame.font.SysFont(family, size)
+		return font
+
+	def render(self, text, size=16, colour=(255, 255, 255), family="monospace", cache=True) -> pygame.Surface:
+		"""
+		Returns the text rendered (antialiased) in a font, from the cache if it has been rendered before.
+		The surface is shared, so must not be drawn on
+
+		Parameters
+		----------
+		text : str
+			Text to render
+		size : int
+			Font size
+		colour : list[int]
+			Text colour
+		family : str
+			Font family
+		cache : bool
+			Whether to look up and keep the surface (False for text that changes every frame)
+		"""
+		if not cache:
+			self.uncached += 1
+			return self.font(size, family).render(text, True, colour)
+
+		key = (text, family, size, tuple(colour))
+		surface = self.surfaces.get(key)
+		if surface is not None:
+			self.surfaces.move_to_end(key)
+			self.hits += 1
+			return surface
+
+		self.misses += 1
+		surface = self.surfaces[key] = self.font(size, family).render(text, True, colour)
+		if len(self.surfaces) > self.capacity:
+			self.surfaces.popitem(last=False)
+			self.evictions += 1
+		return surface
+
+	def stats(self) -> dict:
+		lookups = self.hits + self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"hit_rate": self.hits / lookups if lookups else None,
+			"evictions": self.evictions,
+			"uncached": self.uncached,
+			"surfaces": len(self.surfaces),
+			"fonts": len(self.fonts)
+		}
@@ -3,49 +3,102 @@
 # ROVER_IP = "rover.local"
 ROVER_IP = "localhost"
 
-# Camera information
+# Camera information (up to 16 cameras, tiled by the layout in MissionControl)
 CAM_NAMES = ["Pi Cam"]
 
+# Camera transport: "reqrep" (imagezmq default, one frame in flight), "pubsub" (imagezmq with
+# REQ_REP=False, laptop connects to the rover) or "pushpull" (several frames in flight)
+CAMERA_MODE = "reqrep"
+
 # Window size
 WIDTH, HEIGHT = 1200, 780
 
+# Rate that the gamepad is sampled and axes are sent to the rover (Hz)
+CONTROL_RATE = 100
+
+# Starting camera bandwidth budget (bytes/s), adjusted to the link by the QualityController
+STREAM_BUDGET = 2e6
+
+# Telemetry history kept for plotting: seconds of feedback at the rover's feedback rate (Hz)
+HISTORY_SECONDS, HISTORY_RATE = 3600, 50
+
+# Directory that missions (camera frames and feedback) are recorded into, or None to not record
+RECORD_DIR = None
+
 # ===================================
 
 # Import libraries
-import queue
+import os
+import time
 import pygame
 import numpy as np
 
 # Import classes
 from classes.FeedManager import FeedManager
-from classes.ActionHandler import ActionHandler
+from classes.ActionHandler import ActionHandler, COMMAND_POLICY, TELEMETRY_FIELDS, SYSTEM_FIELDS
 from classes.MissionControl import MissionControl
 from classes.Gamepad import GamepadManager, Gamepad
-from classes.Sockets import SocketTimeout, ControlSend, FeedbackReceive, CameraReceive
-
-
-def main_function(fb_queue, img_queues):
-	sock = ControlSend(ROVER_IP, 5001)
+from classes.Slots import FrameSlot
+from classes.NetworkLoop import NetworkLoop
+from classes.ControlScheduler import ControlScheduler
+from classes.LinkStats import LinkStats
+from classes.TelemetryStore import TelemetryStore
+from classes.TelemetryHistory import TelemetryHistory
+from classes.StreamQuality import QualityController
+from classes.MissionRecorder import MissionRecorder
+from classes.Sockets import SocketTimeout, ControlSend, AxisSend, FeedbackReceive, CameraReceive, PUB_SUB
+
+
+def main_function(network, sock, link, store, img_slots, qc, recorder, run_for=None, on_start=None):
+	"""
+	Runs the UI until it is quit (or for `run_for` seconds), then stops the network. Returns the number
+	of frames drawn, the time taken, the control jitter, each camera's capture to display latency and
+	the text cache's hit rate
+
+	Parameters
+	----------
+	run_for : float
+		Seconds to run for, or None to run until quit
+	on_start : callable
+		Called with the ActionHandler before the main loop starts (eg by the benchmarks)
+	"""
+	axis_sock = AxisSend(ROVER_IP, 5003)
 	mc = MissionControl(WIDTH, HEIGHT, CAM_NAMES)
-	fm = FeedManager(mc, CAM_NAMES, img_queues)
+	store.trail = mc.map_info["trail"] # Every position received is added to the map's trail, not just the latest each frame
+	fm = FeedManager(mc, CAM_NAMES, img_slots)
 	gm = GamepadManager()
-	ah = ActionHandler(sock, mc, fm, gm)
+	ah = ActionHandler(sock, axis_sock, mc, fm, gm)
+
+	# Axes are sampled and sent on their own thread, independent of the frame rate (the gamepad state they
+	# are read from is kept fresh by MissionControl pumping events between the stages of each frame)
+	cs = ControlScheduler(ah, sock, CONTROL_RATE)
+	cs.start()
+
+	if on_start is not None:
+		on_start(ah)
 
 	# Main loop
+	start = time.monotonic()
+	loops = 0
 	done = False
 	while not done:
-		# Check connection
-		conn = sock.check_connection()
-		mc.system_info["connected"] = conn
+		# Connection state (reconnecting is handled in the background by ControlSend)
+		mc.system_info["conn"] = sock.state.value
+
+		# Handle feedback (one snapshot of the latest values per frame)
+		ah.handle_feedback(*store.snapshot())
+		mc.telemetry_info["store"] = store.stats()
 
-		# Handle any feedback
-		fb = []
-		while not fb_queue.empty():
-			ah.handle_feedback(fb_queue.get()) # <-- THIS FUNCTION NEEDS TO BE WRITTEN
+		# Handle pygame events (eg button presses, quitting)
+		done = ah.handle_events(pygame.event.get())
+		mc.system_info["control"] = cs.stats()
+		mc.system_info["link"] = link.summary()
 
-		# Handle pygame events (eg button presses, quitting) and send axis movements
-		done = ah.handle_events(pygame.event.get(), conn)
-		ah.send_axes(conn)
+		# Tell the rover the resolution, quality and fps each camera should be sent at
+		targets = qc.update()
+		if targets is not None:
+			sock.send({"STREAM": targets})
+		mc.system_info["stream"] = qc.stats()
 
 		# Attempt to fetch images from video streams
 		fm.get_images()
@@ -55,18 +108,53 @@ def main_function(fb_queue, img_queues):
 
 		# mc.write_coords() # [Temp]
 		mc.update_display()
+		fm.frames_shown()
 
-	# Quitting
+		loops += 1
+		if run_for is not None and time.monotonic() - start > run_for:
+			done = True
+
+	elapsed = time.monotonic() - start
+
+	# Quitting (stopping the network loop lets the final QUIT_ROVER get sent)
+	cs.stop()
+	network.stop()
+	if recorder is not None:
+		recorder.close()
 	pygame.quit()
-	raise SystemExit
 
-if __name__ == "__main__":
-	feedback_queue = queue.Queue(0)
-	fb = FeedbackReceive(feedback_queue, 5002)
-	fb.start()
+	return {"loops": loops, "elapsed": elapsed, "control": cs.stats(), "latency": fm.latency_stats(), "text": mc.text.stats()}
+
+def start_network():
+	"""Creates the sockets on a network loop and starts it. Returns the arguments for `main_function`"""
+	# All sockets run on one asyncio loop in a single background thread
+	network = NetworkLoop()
+
+	# Clock offset, RTT and message ages, shared by all the sockets
+	link = LinkStats()
 
-	# Create dict with cam names as keys and length 1 queues as values
-	img_queues = dict(zip(CAM_NAMES, [queue.Queue(1) for _ in CAM_NAMES]))
-	cr = CameraReceive(img_queues)
+	sock = ControlSend(ROVER_IP, 5001, policy=COMMAND_POLICY, link=link)
+	network.add(sock)
 
-	main_function(feedback_queue, img_queues)
\ No newline at end of file
+	# Each run is recorded into its own directory
+	recorder = None
+	if RECORD_DIR is not None:
+		recorder = MissionRecorder(os.path.join(RECORD_DIR, time.strftime("%Y%m%d-%H%M%S")))
+
+	# Latest feedback for the UI, and its history for plotting
+	store = TelemetryStore(history=TelemetryHistory(TELEMETRY_FIELDS + SYSTEM_FIELDS, HISTORY_SECONDS * HISTORY_RATE))
+	network.add(FeedbackReceive(store, 5002, link=link, recorder=recorder))
+
+	# Create dict with cam names as keys and latest-frame slots as values
+	img_slots = dict(zip(CAM_NAMES, [FrameSlot() for _ in CAM_NAMES]))
+	address = f"tcp://{ROVER_IP}:5555" if CAMERA_MODE == PUB_SUB else "tcp://*:5555"
+	camera = CameraReceive(img_slots, address, link=link, mode=CAMERA_MODE, recorder=recorder)
+	network.add(camera)
+	qc = QualityController(camera, img_slots, STREAM_BUDGET)
+
+	network.start()
+	return network, sock, link, store, img_slots, qc, recorder
+
+if __name__ == "__main__":
+	main_function(*start_network())
+	raise SystemExit
\ No newline at end of file
@@ -0,0 +1,156 @@
+# Rover stand-in that replays a mission recorded by laptop_main (RECORD_DIR)
+#
+# Serves the control channel on 5001 and receives axes on 5003 like the rover, and sends the recorded
+# feedback to the laptop on 5002 and the recorded JPEGs (as they were received, without re-encoding)
+# over the imagezmq camera channel on 5555. Feedback and frames are stamped with the current time as
+# they are sent. Exits when the laptop sends QUIT_ROVER.
+#
+# Usage:
+#   python replay_rover.py RECORDING [--speed N] [--start SECONDS] [--loop]
+#
+# --speed 1 replays at the recorded timing, 4 at four times the speed, and 0 as fast as possible.
+
+# CONFIG
+# Network information
+LAPTOP_IP = "localhost"
+
+# Camera transport, must match CAMERA_MODE in laptop_main.py
+CAMERA_MODE = "reqrep"
+
+# ===================================
+
+# Import libraries
+import time
+import argparse
+import threading
+
+# Import classes
+from classes.MissionRecorder import MissionReader, FRAME, FEEDBACK
+from classes.Sockets import SendSocket, ControlReceive, AxisReceive, CameraSend, PUB_SUB
+
+
+class Replay:
+	"""
+	Plays back the records of one kind with the recorded timing scaled by `speed`. Each kind is played
+	on its own thread against the same clock, so feedback isn't held up by a camera waiting for a reply
+	"""
+	def __init__(self, reader, speed=1.0, start=None, loop=False):
+		"""
+		Parameters
+		----------
+		reader : MissionReader
+			Recording to replay
+		speed : float
+			Replay speed (1 is the recorded timing), or 0 to send as fast as possible
+		start : float
+			Seconds into the recording to start from
+		loop : bool
+			Whether to start again from `start` at the end of the recording
+		"""
+		self.reader = reader
+		self.speed = speed
+		self.start = reader.start + (start or 0)
+		self.duration = reader.end - self.start
+		self.loop = loop
+
+		self.running = True
+		self.epoch = time.perf_counter()
+		self.sent = {FRAME: 0, FEEDBACK: 0}
+
+	def play(self, kind, send):
+		"""Send every record of `kind` with `send(record)` at its time"""
+		repeat = 0
+		while self.running:
+			for record in self.reader.records(self.start):
+				if not self.running:
+					return
+				if record.kind != kind:
+					continue
+
+				if self.speed:
+					due = self.epoch + (repeat * self.duration + record.time - self.start) / self.speed
+					time.sleep(max(0, due - time.perf_counter()))
+
+				send(record)
+				self.sent[kind] += 1
+
+			if not self.loop:
+				return
+			repeat += 1
+
+	def stop(self):
+		self.running = False
+
+
+def send_feedback(replay):
+	"""Connect to the laptop's feedback port and replay the feedback"""
+	sock = SendSocket(LAPTOP_IP, 5002, "<Hd")
+	while replay.running and not sock.check_connection():
+		time.sleep(0.5)
+
+	replay.play(FEEDBACK, lambda record: sock.send((MissionReader.feedback(record), [])))
+	sock.stop()
+
+
+def send_frames(replay):
+	"""Replay the camera frames over the imagezmq protocol"""
+	address = "tcp://*:5555" if CAMERA_MODE == PUB_SUB else f"tcp://{LAPTOP_IP}:5555"
+	sender = CameraSend(address, CAMERA_MODE)
+
+	replay.play(FRAME, lambda record: sender.send_jpg({"name": record.name, "time": time.time()}, record.payload))
+	sender.close()
+
+
+def receive_axes(replay, axis_sock):
+	"""Keep the latest axis state from the laptop"""
+	while replay.running:
+		axis_sock.recv(0.5)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Replay a recorded mission as the rover")
+	parser.add_argument("recording", help="Recording directory")
+	parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, or 0 for as fast as possible")
+	parser.add_argument("--start", type=float, default=0.0, help="Seconds into the recording to start from")
+	parser.add_argument("--loop", action="store_true", help="Start again at the end of the recording")
+	args = parser.parse_args()
+
+	reader = MissionReader(args.recording)
+	if not len(reader):
+		raise SystemExit(f"No records in {args.recording}")
+	print(f"Replaying {len(reader)} records ({reader.end - reader.start:.1f}s) at {args.speed or 'max'}x")
+
+	replay = Replay(reader, args.speed, args.start, args.loop)
+	control = ControlReceive(5001)
+	axis_sock = AxisReceive(5003)
+
+	def handle(message):
+		"""Commands from the laptop"""
+		if "QUIT_ROVER" in message:
+			print("Exiting")
+			replay.stop()
+			control.stop()
+		else:
+			print(message)
+
+	threads = [
+		threading.Thread(target=control.run, args=(handle,), daemon=True),
+		threading.Thread(target=receive_axes, args=(replay, axis_sock), daemon=True),
+		threading.Thread(target=send_feedback, args=(replay,), daemon=True),
+		threading.Thread(target=send_frames, args=(replay,), daemon=True),
+	]
+	for thread in threads:
+		thread.start()
+
+	try:
+		# Finished when both streams have been replayed (or the laptop quits)
+		for thread in threads[2:]:
+			while thread.is_alive():
+				thread.join(0.5)
+	except KeyboardInterrupt:
+		print(" KeyboardInterrupt caught")
+
+	elapsed = time.perf_counter() - replay.epoch
+	print(f"Sent {replay.sent[FRAME]} frames and {replay.sent[FEEDBACK]} feedback messages in {elapsed:.1f}s, received {axis_sock.received} axis states")
+	replay.stop()
+	control.stop()
@@ -0,0 +1,263 @@
+# Rover stand-in that generates camera frames and telemetry, for load testing laptop_main without the
+# rover or cameras
+#
+# Serves the control channel on 5001 and receives axes on 5003 like the rover, sends telemetry
+# ("<Hd" feedback) to the laptop on 5002 and moving test-pattern frames for each camera over the
+# imagezmq camera channel on 5555. Exits when the laptop sends QUIT_ROVER.
+#
+# Each camera's frames are encoded once at startup (a CYCLE of moving frames that repeats), so the
+# load on the laptop isn't limited by how fast this machine can encode. With --shape, frames are
+# encoded live instead, following the quality the laptop asks for (STREAM).
+#
+# Usage:
+#   python synthetic_rover.py [--cameras N] [--width W] [--height H] [--fps F] [--quality Q] [--telemetry HZ] [--shape]
+#
+# eg the 8 x 1080p x 30 fps load test:
+#   python synthetic_rover.py --cameras 8 --width 1920 --height 1080 --fps 30
+
+# CONFIG
+# Network information
+LAPTOP_IP = "localhost"
+
+# Camera transport, must match CAMERA_MODE in laptop_main.py
+CAMERA_MODE = "reqrep"
+
+# Camera names (must match CAM_NAMES in laptop_main.py to be shown), extra cameras are "Cam N"
+CAM_NAMES = ["Pi Cam"]
+
+# Number of frames in the repeating cycle of pre-encoded frames
+CYCLE = 30
+
+# How often the telemetry status is printed (seconds)
+REPORT_INTERVAL = 5.0
+
+# ===================================
+
+# Import libraries
+import cv2
+import math
+import time
+import random
+import argparse
+import threading
+import numpy as np
+
+# Import classes
+from classes.StreamQuality import StreamShaper
+from classes.Sockets import SendSocket, ControlReceive, AxisReceive, CameraSend, PUB_SUB
+
+
+class TestPattern:
+	"""Moving test pattern for one camera: colour bars with a bouncing box, the camera name and the frame number"""
+	def __init__(self, name, index, width, height):
+		self.name = name
+		self.width, self.height = width, height
+
+		# Colour bars, shifted in hue for each camera so they can be told apart
+		bars = np.array([[255, 255, 255], [0, 255, 255], [255, 255, 0], [0, 255, 0], [255, 0, 255], [0, 0, 255], [255, 0, 0]], dtype=np.uint8)
+		bars = np.roll(bars, index, axis=0)
+		columns = np.arange(width) * len(bars) // width
+		self.background = np.repeat(bars[columns][None, :, :], height, axis=0)
+
+		# Low contrast noise, so the JPEGs are closer to a camera's size than flat colour would be
+		rng = np.random.default_rng(index)
+		noise = rng.integers(0, 24, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+		self.background = self.background // 2 + cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)
+
+		self.box = max(8, height // 6)
+
+	def frame(self, number):
+		frame = self.background.copy()
+
+		# Box bouncing across the frame
+		phase = (number % 60) / 60
+		x = int((self.width - self.box) * (1 - abs(2 * phase - 1)))
+		y = int((self.height - self.box) * (0.5 + 0.4 * math.sin(2 * math.pi * phase)))
+		frame[y:y + self.box, x:x + self.box] = 32
+
+		scale = self.height / 480
+		cv2.putText(frame, f"{self.name} {number:06d}", (int(10 * scale), int(40 * scale)), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), max(1, int(2 * scale)))
+		return frame
+
+
+class Telemetry:
+	"""Rover state that changes smoothly: driving in a circle with a draining battery, and occasional LOG events"""
+	def __init__(self):
+		self.start = time.monotonic()
+
+	def feedback(self) -> dict:
+		t = time.monotonic() - self.start
+		heading = (0.1 * t) % (2 * math.pi)
+		speed = 0.5 + 0.1 * math.sin(0.7 * t)
+		battery = max(0, 100 - t / 60)
+
+		fb = {
+			"speed": round(speed, 3),
+			"elevation": round(12 + 2 * math.sin(0.05 * t), 2),
+			"pitch": round(0.05 * math.sin(0.9 * t) + random.gauss(0, 0.005), 4),
+			"roll": round(0.04 * math.sin(1.3 * t) + random.gauss(0, 0.005), 4),
+			"heading": round(heading, 4),
+			"battery": round(battery),
+			"voltage": round(10.5 + 2 * battery / 100, 2),
+			"current": round(3 + 2 * speed, 2),
+			"position": [round(30 * math.cos(heading), 2), round(30 * math.sin(heading), 2)]
+		}
+
+		if random.random() < 0.002:
+			fb["LOG"] = f"Synthetic event at {t:.1f}s"
+		return fb
+
+
+class SyntheticRover:
+	"""Sends telemetry and test-pattern frames from each camera at a fixed rate until stopped"""
+	def __init__(self, names, width, height, fps, quality, telemetry_rate, shape):
+		"""
+		Parameters
+		----------
+		names : list[str]
+			Camera names
+		width, height : int
+			Frame size
+		fps : float
+			Frame rate of each camera
+		quality : int
+			JPEG quality (unless the laptop sets it, with `shape`)
+		telemetry_rate : float
+			Feedback messages per second
+		shape : bool
+			Encode every frame to the laptop's STREAM targets, instead of repeating pre-encoded frames
+		"""
+		self.names = names
+		self.fps = fps
+		self.telemetry_rate = telemetry_rate
+		self.shape = shape
+		self.running = True
+
+		self.patterns = [TestPattern(name, i, width, height) for i, name in enumerate(names)]
+		self.shaper = StreamShaper(quality)
+		if not shape:
+			print(f"Encoding {CYCLE} frames for {len(names)} cameras at {width}x{height}")
+			self.cycles = [[self.shaper.encode(p.name, p.frame(i)) for i in range(CYCLE)] for p in self.patterns]
+
+		self.frames_sent = 0
+		self.sent = dict.fromkeys(names, 0) # Frames sent per camera
+		self.bytes_sent = 0
+		self.feedback_sent = 0
+
+	def send_frames(self):
+		"""Send each camera's frames, staggered across the frame period"""
+		address = "tcp://*:5555" if CAMERA_MODE == PUB_SUB else f"tcp://{LAPTOP_IP}:5555"
+		sender = CameraSend(address, CAMERA_MODE)
+
+		period = 1 / self.fps
+		start = time.perf_counter()
+		number = 0
+		while self.running:
+			for i, pattern in enumerate(self.patterns):
+				due = start + (number + i / len(self.patterns)) * period
+				time.sleep(max(0, due - time.perf_counter()))
+
+				if self.shape:
+					jpg = self.shaper.encode(pattern.name, pattern.frame(number))
+					if jpg is None:
+						continue
+				else:
+					jpg = self.cycles[i][number % CYCLE]
+
+				sender.send_jpg({"name": pattern.name, "time": time.time(), "id": self.sent[pattern.name]}, jpg)
+				self.frames_sent += 1
+				self.sent[pattern.name] += 1
+				self.bytes_sent += len(jpg)
+			number += 1
+
+			# Fell behind (eg the laptop is slow to reply in REQ_REP), so skip frames rather than burst
+			if time.perf_counter() - (start + number * period) > period:
+				number = int((time.perf_counter() - start) / period)
+
+		sender.close()
+
+	def send_telemetry(self):
+		sock = SendSocket(LAPTOP_IP, 5002, "<Hd")
+		telemetry = Telemetry()
+
+		next_send = time.perf_counter()
+		while self.running:
+			if not sock.check_connection():
+				time.sleep(0.5)
+				continue
+
+			sock.send((telemetry.feedback(), []))
+			self.feedback_sent += 1
+
+			next_send = max(next_send + 1 / self.telemetry_rate, time.perf_counter())
+			time.sleep(max(0, next_send - time.perf_counter()))
+		sock.stop()
+
+	def stop(self):
+		self.running = False
+
+
+def receive_axes(rover, axis_sock):
+	"""Keep the latest axis state from the laptop"""
+	while rover.running:
+		axis_sock.recv(0.5)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Synthetic rover for load testing")
+	parser.add_argument("--cameras", type=int, default=len(CAM_NAMES), help="Number of cameras")
+	parser.add_argument("--width", type=int, default=640)
+	parser.add_argument("--height", type=int, default=480)
+	parser.add_argument("--fps", type=float, default=30, help="Frame rate of each camera")
+	parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+	parser.add_argument("--telemetry", type=float, default=50, help="Feedback messages per second")
+	parser.add_argument("--shape", action="store_true", help="Encode live, following the laptop's STREAM targets")
+	args = parser.parse_args()
+
+	names = (CAM_NAMES + [f"Cam {i + 1}" for i in range(len(CAM_NAMES), args.cameras)])[:args.cameras]
+	rover = SyntheticRover(names, args.width, args.height, args.fps, args.quality, args.telemetry, args.shape)
+	control = ControlReceive(5001)
+	axis_sock = AxisReceive(5003)
+
+	def handle(message):
+		"""Commands from the laptop"""
+		if "QUIT_ROVER" in message:
+			print("Exiting")
+			rover.stop()
+			control.stop()
+		elif "STREAM" in message:
+			rover.shaper.set_targets(message["STREAM"])
+		else:
+			print(message)
+
+	threads = [
+		threading.Thread(target=control.run, args=(handle,), name="rover-control", daemon=True),
+		threading.Thread(target=receive_axes, args=(rover, axis_sock), name="rover-axes", daemon=True),
+		threading.Thread(target=rover.send_telemetry, name="rover-telemetry", daemon=True),
+		threading.Thread(target=rover.send_frames, name="rover-frames", daemon=True),
+	]
+	for thread in threads:
+		thread.start()
+
+	print(f"Sending {len(names)} cameras at {args.width}x{args.height} {args.fps:g} fps and telemetry at {args.telemetry:g} Hz")
+	try:
+		previous = (time.perf_counter(), 0, 0, 0)
+		while rover.running:
+			time.sleep(min(REPORT_INTERVAL, 0.5))
+			now = time.perf_counter()
+			if now - previous[0] < REPORT_INTERVAL:
+				continue
+
+			elapsed = now - previous[0]
+			print(
+				f"{(rover.frames_sent - previous[1]) / elapsed:.1f} frames/s, "
+				f"{(rover.bytes_sent - previous[2]) / elapsed / 2**20:.1f} MB/s, "
+				f"{(rover.feedback_sent - previous[3]) / elapsed:.1f} feedback/s, "
+				f"{axis_sock.received} axis states"
+			)
+			previous = (now, rover.frames_sent, rover.bytes_sent, rover.feedback_sent)
+	except KeyboardInterrupt:
+		print(" KeyboardInterrupt caught")
+
+	rover.stop()
+	control.stop()